@@ -1,9 +1,16 @@
-from flask import Flask, request, send_from_directory, render_template, jsonify
+from flask import Flask, request, send_from_directory, render_template, jsonify, g, abort
+from werkzeug.utils import safe_join
+from urllib.parse import quote
 import os
-import platform
+import mimetypes
 import logging
 import pwd  # 获取当前用户信息
 import asyncio
+import threading
+import concurrent.futures
+import uuid
+
+from logging_setup import configure_logging
 
 # 全局定义音频目录
 AUDIO_DIR = 'static/audio'
@@ -14,120 +21,609 @@ DEFAULT_TTS_STRATEGY = 'gtts'  # 设置默认TTS策略为gtts
 # 确保音频目录存在
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
-def get_current_user():
-    return pwd.getpwuid(os.getuid()).pw_name
-
-# 创建日志过滤器来拦截unknown模型日志
-class ModelLogFilter(logging.Filter):
-    def filter(self, record):
-        # 增强调试信息输出
-        if getattr(record, 'model', None) == 'unknown':
-            print(f"[DEBUG] 阻止打印unknown日志，来源: {record.name}:{record.lineno}")
-            return False
-        return True
-
-# 设置日志格式
-class TTSLogFormatter(logging.Formatter):
-    def format(self, record):
-        # 强制移除所有'model'属性并设置默认值
-        if not hasattr(record, 'model'):
-            record.model = 'unknown'
-        
-        # 清理特殊属性防止格式化错误
-        if record.model == 'unknown':
-            record.model = ''  # 设置为空字符串避免显示
-        
-        try:
-            return super().format(record)
-        except ValueError as e:
-            if 'model' in str(e):
-                return record.getMessage()
-            raise
+# 音频文件的交付方式：
+#   python - 由 Flask 读取文件并返回（默认）
+#   sendfile - 返回 X-Sendfile 头，由 Apache/lighttpd 等前端直接发送文件
+#   accel - 返回 X-Accel-Redirect 头，由 nginx 从 AUDIO_ACCEL_PREFIX 对应的 internal location 发送
+#   static - get_audio 直接返回 AUDIO_STATIC_URL 下的静态地址，请求完全不经过 Python
+# 音频目录中以 . 开头的是写入中的临时文件，前端代理直接提供该目录时应拒绝此类路径
+AUDIO_SERVE_MODE = os.environ.get('AUDIO_SERVE_MODE', 'python').lower()
+AUDIO_ACCEL_PREFIX = os.environ.get('AUDIO_ACCEL_PREFIX', '/_protected_audio/')
+AUDIO_STATIC_URL = os.environ.get('AUDIO_STATIC_URL', '/static/audio/')
 
-formatter = TTSLogFormatter('[%(asctime)s] 使用模型: %(model)s')
-handler = logging.StreamHandler()
-handler.setFormatter(formatter)
-handler.addFilter(ModelLogFilter())  # 添加过滤器
+# 缓存校验索引、隔离文件和锁文件的目录，必须在对外提供的静态目录之外
+CACHE_STATE_DIR = os.environ.get('CACHE_STATE_DIR', 'data/cache_state')
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-logger.addHandler(handler)
+# 标识浏览器的 cookie，预取按它区分客户端
+CLIENT_ID_COOKIE = 'client_id'
 
+def get_current_user():
+    return pwd.getpwuid(os.getuid()).pw_name
 
 def create_app():
     app = Flask(__name__)
     global AUDIO_DIR
 
-    # 导入 TTS 策略模块
-    from tts_strategies import GTTSStrategy, MacSayStrategy, EdgeTTSStrategy
-
-    # 创建 TTS 策略实例
-    try:
-        tts_strategies = {
-            'gtts': GTTSStrategy(),
-            'macsay': MacSayStrategy(),
-            'edgetts': EdgeTTSStrategy(voice='zh-CN-XiaoxiaoNeural')  # 使用有效的中文语音模型
-        }
-    except Exception as e:
-        print(f"初始化 TTS 策略时出错: {str(e)}")
-        tts_strategies = {
-            'gtts': GTTSStrategy(),
-            'macsay': MacSayStrategy(),
-            'edgetts': EdgeTTSStrategy(voice='zh-CN-XiaoxiaoNeural')  # 使用默认中文语音模型
-        }
+    # sendfile 模式下 send_from_directory 只返回 X-Sendfile 头，不读取文件内容
+    app.use_x_sendfile = AUDIO_SERVE_MODE == 'sendfile'
+
+    # TTS 策略注册表：引擎在第一次使用时才导入和初始化
+    tts_strategies = StrategyRegistry(default=DEFAULT_TTS_STRATEGY)
 
     # 记录上一次生成的音频文件
     last_audio_url = None
 
+    # 按需启用的请求采样分析器
+    profiler = RequestProfiler()
+
+    # 合成失败的负缓存和每个引擎的重试预算
+    failure_cache = FailureCache()
+
+    def invalidate_pinyins(pinyins):
+        """
+        词表更新后删除合成文本发生变化的拼音在各引擎下的缓存音频、变速变调版本、
+        失败记录和相关音频包。
+
+        与仍在使用旧快照的合成存在竞争：删除之后才写入的文件由 ensure_audio
+        写入后的复核处理（见 expected_text）。
+        """
+        stale = {audio_file_for(pinyin, engine) for pinyin in pinyins for engine in tts_strategies.names()}
+        failure_cache.forget(stale)
+        removed = 0
+        for filename in os.listdir(AUDIO_DIR):
+            if filename in stale or filename.partition('@')[0] in stale:
+                try:
+                    os.remove(os.path.join(AUDIO_DIR, filename))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                cache_index.discard(filename)
+        sprites = remove_sprites_containing(pinyins)
+        logger.info(f'词表更新清理缓存: {removed} 个音频文件, {len(sprites)} 个音频包')
+
+    # 缓存文件的校验索引，由 ensure_audio 写入、后台巡检使用
+    cache_index = CacheIndex(AUDIO_DIR, CACHE_STATE_DIR)
+
+    # 可热更新的词表；拼音近似匹配和输入联想索引随词表版本一起构建和替换
+    lexicon = Lexicon(fallback=pinyin_to_hanzi, on_change=invalidate_pinyins)
+    lexicon.watch(float(os.environ.get('LEXICON_WATCH_INTERVAL', '5')))
+
     @app.route('/')
     def index():
         return render_template('index.html')
 
-    @app.route('/get_audio', methods=['POST'])
-    async def get_audio():
-        global last_audio_url
-        pinyin = request.form['pinyin']
-        hanzi = pinyin_to_hanzi.get(pinyin, pinyin)
-        
-        # 获取用户选择的 TTS 引擎，默认为 gtts
-        tts_engine = request.form.get('tts', 'gtts').lower()
-        
-        # 显式设置当前模型名称
-        model_name = tts_engine if tts_engine != 'unknown' else 'gtts'
-        
-        strategy = tts_strategies.get(tts_engine, DEFAULT_TTS_STRATEGY)
-        
+    def audio_file_for(pinyin, tts_engine):
         # 修改音频文件扩展名为 .wav（macsay 使用 wav 格式）
         if tts_engine == 'macsay':
-            audio_file = f'{pinyin}.wav'
+            return f'{pinyin}.wav'
         elif tts_engine == 'edgetts':
-            audio_file = f'{pinyin}.mp3'  # Edge-TTS 默认输出 mp3
+            return f'{pinyin}.mp3'  # Edge-TTS 默认输出 mp3
         else:
-            audio_file = f'{pinyin}.mp3'  # 默认使用 mp3
-
+            return f'{pinyin}.mp3'  # 默认使用 mp3
+
+    def requested_engine(values):
+        """
+        读取请求中的 TTS 引擎名称，未指定时使用默认引擎；引擎未启用时返回 None。
+        """
+        tts_engine = (values.get('tts') or tts_strategies.default or '').lower()
+        return tts_engine if tts_engine in tts_strategies else None
+
+    def unknown_engine_response(values):
+        return jsonify({'error': f"TTS 引擎未启用: {values.get('tts')}",
+                        'engines': tts_strategies.names()}), 400
+
+    def audio_url_for(audio_file):
+        # static 模式返回前端代理直接提供的地址，其余模式仍经过 /audio 路由
+        if AUDIO_SERVE_MODE == 'static':
+            return AUDIO_STATIC_URL + quote(audio_file)
+        return f'/audio/{audio_file}'
+
+    def expected_text(pinyin):
+        """
+        按当前词表返回拼音应合成的文本；词表未收录的拼音按原样合成。
+        长文本分句的 key 不在词表中，返回 None 表示无需复核。
+        """
+        if pinyin.startswith('chunk-'):
+            return None
+        return lexicon.current().mapping.get(pinyin, pinyin)
+
+    # 正在合成的 key: (引擎, 音频文件名) -> concurrent.futures.Future。
+    # 请求、预取、长文本和巡检修复各自运行在不同的事件循环中，因此使用线程安全的 Future
+    inflight = {}
+    inflight_lock = threading.Lock()
+
+    async def ensure_audio(pinyin, hanzi, tts_engine, speculative=False):
+        """
+        确保拼音对应的音频已缓存，未命中时调用 TTS 策略合成。
+
+        同一个 key 同时只合成一次：合成进行中时（如用户点击了正在预取的拼音），
+        后来的调用等待同一个结果，不会重复请求上游。
+
+        参数:
+            speculative (bool): 预取、巡检修复等非用户请求的合成。引擎或 key 处于失败状态时直接跳过，
+                失败也不写入共享的失败缓存，不会消耗用户请求的重试预算。
+
+        返回:
+            tuple: (音频文件名, 策略实例)
+        """
+        with span('engine_lookup', engine=tts_engine):
+            strategy = tts_strategies.get(tts_engine)
+        if strategy is None:
+            raise RuntimeError(f'没有可用的 TTS 引擎: {tts_engine}')
+        audio_file = audio_file_for(pinyin, tts_engine)
+
+        with span('cache_check'):
+            cached = os.path.exists(os.path.join(AUDIO_DIR, audio_file))
+        while not cached:
+            key = (tts_engine, audio_file)
+            with inflight_lock:
+                pending = inflight.get(key)
+                owner = pending is None
+                if owner:
+                    pending = inflight[key] = concurrent.futures.Future()
+            if owner:
+                # 先移出再设置结果，等待者被唤醒后重试时不会再拿到这个已完成的 Future
+                try:
+                    await synthesize_audio(pinyin, hanzi, tts_engine, strategy, audio_file, speculative)
+                except BaseException as e:
+                    with inflight_lock:
+                        inflight.pop(key, None)
+                    # 本请求被取消不代表合成失败，等待者收到普通异常后自行重试
+                    pending.set_exception(e if isinstance(e, Exception) else RuntimeError('合成已取消'))
+                    raise
+                with inflight_lock:
+                    inflight.pop(key, None)
+                pending.set_result(None)
+                break
+            try:
+                with span('inflight_wait'):
+                    await asyncio.wrap_future(pending)
+                break
+            except SynthesisBackoff:
+                raise
+            except Exception:
+                # 预取的失败不记入失败缓存，用户请求不应直接沿用，自己重新合成一次
+                if speculative:
+                    raise
+                cached = os.path.exists(os.path.join(AUDIO_DIR, audio_file))
+        return audio_file, strategy
+
+    async def synthesize_audio(pinyin, hanzi, tts_engine, strategy, audio_file, speculative):
+        """
+        调用 TTS 策略合成并原子写入缓存，由 ensure_audio 保证同一个 key 只有一个调用在执行。
+        """
         audio_path = os.path.join(AUDIO_DIR, audio_file)
-
-        if not os.path.exists(audio_path):
+        # 最近失败过的 key 或预算耗尽的引擎直接拒绝，不再请求上游
+        model_name = getattr(strategy, 'name', tts_engine)
+        if speculative:
+            if failure_cache.is_failing(model_name, audio_file):
+                raise RuntimeError(f'{model_name} 处于失败状态，跳过后台合成')
+        else:
+            failure_cache.check(model_name, audio_file)
+        while True:
             # 使用策略模式生成音频
+            logger.debug("正在使用 %s 合成语音: '%s'", model_name, hanzi, extra={'model': model_name})
+            # 先写临时文件，校验通过后原子替换到位，缓存目录中只会出现完整的音频
+            tmp_path = temp_path_for(audio_path)
             try:
-                model_name = getattr(strategy, 'name', tts_engine)
-                print(f"正在使用 {model_name} 合成语音: '{hanzi}'")  # 添加调试信息
-                if asyncio.iscoroutinefunction(strategy.text_to_speech):
-                    await strategy.text_to_speech(text=hanzi, lang='zh-cn', output_path=audio_path)
-                else:
-                    strategy.text_to_speech(text=hanzi, lang='zh-cn', output_path=audio_path)
+                with span('synthesize', engine=model_name, text=hanzi):
+                    if asyncio.iscoroutinefunction(strategy.text_to_speech):
+                        await strategy.text_to_speech(text=hanzi, lang='zh-cn', output_path=tmp_path)
+                    else:
+                        # 同步引擎放到线程中执行，长文本的多个分句才能真正并发合成
+                        await asyncio.to_thread(strategy.text_to_speech, text=hanzi, lang='zh-cn',
+                                                output_path=tmp_path)
+                duration, error = validate_clip(tmp_path)
+                if error is not None:
+                    raise RuntimeError(f'合成结果无效: {error}')
+                os.replace(tmp_path, audio_path)
             except Exception as e:
-                print(f"音频合成错误: {str(e)}")
-                return jsonify({'error': f'音频合成失败: {str(e)}'}), 500
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                if speculative:
+                    raise
+                retry_after = failure_cache.record_failure(model_name, audio_file, str(e))
+                raise SynthesisBackoff(f'音频合成失败: {str(e)}', retry_after, str(e)) from e
+            failure_cache.record_success(model_name, audio_file)
+            # 合成期间词表可能已更新，失效清理又早于本次写入：写入后按当前词表复核，
+            # 文本已变化时删除刚写入的文件并用新文本重新合成
+            current = expected_text(pinyin)
+            if current is None or current == hanzi:
+                break
+            os.remove(audio_path)
+            logger.info(f'词表已更新，重新合成: {pinyin}', extra={'model': model_name})
+            hanzi = current
+        cache_index.record(audio_file, tts_engine, duration, text=hanzi)
+
+    async def ensure_variant(audio_file, tts_engine, speed, pitch):
+        """
+        确保已缓存音频的变速变调版本存在，首次请求时在本地用 DSP 生成。
+
+        返回:
+            str: 变体音频文件名
+        """
+        variant_file = variant_file_for(audio_file, speed, pitch)
+        variant_path = os.path.join(AUDIO_DIR, variant_file)
+        with span('variant_cache_check'):
+            cached = os.path.exists(variant_path)
+        if not cached:
+            with span('render_variant', speed=speed, pitch=pitch):
+                # librosa 计算放到线程池，不阻塞事件循环
+                duration = await asyncio.to_thread(render_variant, os.path.join(AUDIO_DIR, audio_file),
+                                                   variant_path, speed, pitch)
+            cache_index.record(variant_file, tts_engine, duration)
+        return variant_file
+
+    def resolve_for_prefetch(pinyin):
+        hanzi = lexicon.current().mapping.get(pinyin)
+        return (pinyin, hanzi) if hanzi else None
+
+    def is_cached(pinyin, tts_engine):
+        return os.path.exists(os.path.join(AUDIO_DIR, audio_file_for(pinyin, tts_engine)))
+
+    def resynthesize(audio_file, entry):
+        """
+        重新合成被巡检隔离的缓存文件，引擎未登记时按扩展名推断。
+
+        修复是低优先级的后台任务：按非用户请求合成，引擎处于失败状态时跳过，
+        失败也不计入共享的失败缓存，不会影响用户请求的重试预算。
+        """
+        entry = entry or {}
+        tts_engine = entry.get('engine')
+        pinyin, ext = os.path.splitext(audio_file)
+        variant = parse_variant_file(audio_file)
+        if variant is not None:
+            # 变体文件：原音频可能也已损坏，先确保原音频再重新生成
+            audio_file, speed, pitch = variant
+            pinyin, ext = os.path.splitext(audio_file)
+        if tts_engine is None:
+            tts_engine = 'macsay' if ext == '.wav' else tts_strategies.default
+        if tts_engine not in tts_strategies:
+            raise RuntimeError(f'TTS 引擎未启用: {tts_engine}')
+        if failure_cache.is_failing(tts_engine):
+            raise RuntimeError(f'{tts_engine} 处于失败状态，暂不修复')
+        hanzi = entry.get('text') if variant is None else None
+        if not hanzi:
+            if pinyin.startswith('chunk-'):
+                # 长文本分句的文件名是哈希，没有登记原文时无法重新合成
+                raise RuntimeError('分句原文未登记')
+            hanzi = lexicon.current().mapping.get(pinyin, pinyin)
+        asyncio.run(ensure_audio(pinyin, hanzi, tts_engine, speculative=True))
+        if variant is not None:
+            asyncio.run(ensure_variant(audio_file, tts_engine, speed, pitch))
+
+    # 后台缓存巡检：校验和、文件头检查、隔离损坏文件并重新合成
+    scrubber = CacheScrubber(AUDIO_DIR, cache_index, resynthesize,
+                             interval=float(os.environ.get('CACHE_SCRUB_INTERVAL', '3600')),
+                             bytes_per_sec=int(os.environ.get('CACHE_SCRUB_BYTES_PER_SEC', str(1024 * 1024))))
+    scrubber.start()
+
+    # 长文本按分句并发合成，每个分句单独缓存
+    long_text = LongTextSynthesizer(ensure_audio, concurrency=int(os.environ.get('LONG_TEXT_CONCURRENCY', '4')))
+    long_text_max_chars = int(os.environ.get('LONG_TEXT_MAX_CHARS', '2000'))
+
+    # 生成音频包时每批并发合成的数量
+    sprite_build_concurrency = max(1, int(os.environ.get('SPRITE_BUILD_CONCURRENCY', '4')))
+
+    async def prefetch_audio(pinyin, hanzi, tts_engine):
+        return await ensure_audio(pinyin, hanzi, tts_engine, speculative=True)
+
+    # 根据访问序列和课文顺序预测下一个拼音，后台预先合成
+    prefetcher = prefetcher_from_env(prefetch_audio, is_cached, resolve_for_prefetch)
+
+    @app.before_request
+    def begin_trace():
+        g.trace, g.trace_token = start_trace(request.endpoint or request.path)
+
+    @app.before_request
+    def hide_dotfiles():
+        # Flask 自带的 /static 路由同样不提供写入中的临时文件等隐藏文件
+        if request.endpoint == 'static' and any(
+                part.startswith('.') for part in (request.view_args or {}).get('filename', '').split('/')):
+            abort(404)
+
+    @app.before_request
+    def identify_client():
+        # 预取按客户端记录访问序列；同一 NAT 后的多台设备 remote_addr 相同，改用 cookie 区分
+        g.client_id = request.cookies.get(CLIENT_ID_COOKIE)
+        g.new_client_id = None
+        if not g.client_id or len(g.client_id) > 64:
+            g.client_id = g.new_client_id = uuid.uuid4().hex
+
+    @app.after_request
+    def set_client_id(response):
+        if getattr(g, 'new_client_id', None):
+            response.set_cookie(CLIENT_ID_COOKIE, g.new_client_id, max_age=365 * 24 * 3600,
+                                httponly=True, samesite='Lax')
+        return response
+
+    @app.after_request
+    def end_trace(response):
+        trace = getattr(g, 'trace', None)
+        if trace is not None:
+            finish_trace(trace, g.trace_token)
+            trace.attrs['status'] = response.status_code
+            response.headers['Server-Timing'] = server_timing(trace)
+            response.headers['X-Trace-Id'] = trace.trace_id
+        return response
+
+    def require_admin():
+        # 未配置 ADMIN_TOKEN 时管理接口全部关闭
+        token = os.environ.get('ADMIN_TOKEN')
+        if not token or request.headers.get('X-Admin-Token') != token:
+            return jsonify({'error': '无权访问'}), 403
+        return None
+
+    @app.route('/admin/traces')
+    def admin_traces():
+        denied = require_admin()
+        if denied:
+            return denied
+        limit = request.args.get('limit', 100, type=int)
+        traces = list(RECENT_TRACES)[-limit:]
+        if request.args.get('format') == 'json':
+            return jsonify([trace.to_dict() for trace in traces])
+        return jsonify(export_chrome_trace(traces))
+
+    @app.route('/admin/profile', methods=['GET', 'POST'])
+    def admin_profile():
+        """
+        POST n=采样请求数 开始采样，GET 查看汇总的热点函数。
+        """
+        denied = require_admin()
+        if denied:
+            return denied
+        if request.method == 'POST':
+            profiler.arm(request.form.get('n', 20, type=int))
+        return jsonify(profiler.report(request.args.get('limit', 30, type=int)))
+
+    @app.route('/admin/lexicon', methods=['GET', 'POST'])
+    def admin_lexicon():
+        """
+        GET 返回当前词表版本；POST 在后台重新加载词表文件（不等待文件修改检测）。
+        """
+        denied = require_admin()
+        if denied:
+            return denied
+        if request.method == 'POST':
+            lexicon.reload_async(force=True)
+            return jsonify({'status': 'reloading', 'version': lexicon.current().version}), 202
+        snapshot = lexicon.current()
+        return jsonify({'version': snapshot.version, 'source': snapshot.source,
+                        'entries': len(snapshot.mapping)})
+
+    @app.route('/admin/prefetch')
+    def admin_prefetch():
+        denied = require_admin()
+        if denied:
+            return denied
+        return jsonify(prefetcher.stats())
+
+    @app.route('/admin/scrub', methods=['GET', 'POST'])
+    def admin_scrub():
+        """
+        GET 返回最近一次巡检结果；POST 立即在后台执行一次巡检。
+        """
+        denied = require_admin()
+        if denied:
+            return denied
+        if request.method == 'POST':
+            threading.Thread(target=scrubber.scan, daemon=True).start()
+            return jsonify({'status': 'scanning'}), 202
+        return jsonify(scrubber.stats())
 
-        audio_url = f'/audio/{audio_file}'
+    @app.route('/get_audio', methods=['POST'])
+    @profiler.profiled
+    async def get_audio():
+        global last_audio_url
+        requested = request.form['pinyin']
+        # 未收录的拼写错误纠正到最接近的音节，复用其缓存，不把错误输入发给 TTS
+        # 整个请求使用同一版本的词表，热更新不会影响进行中的请求
+        snapshot = lexicon.current()
+        with span('resolve_pinyin'):
+            pinyin, hanzi = resolve_pinyin(requested, snapshot.mapping, snapshot.fuzzy_index)
+        if pinyin is None:
+            # 没有唯一的近似音节时不做猜测，返回候选让用户选择
+            suggestions = [{'pinyin': key, 'hanzi': snapshot.mapping.get(key)}
+                           for key in snapshot.fuzzy_index.suggestions(normalize_pinyin(requested))]
+            return jsonify({'error': f'无法识别的拼音: {requested}', 'suggestions': suggestions}), 400
+        
+        # 获取用户选择的 TTS 引擎，未启用的引擎直接拒绝，不悄悄换成其他引擎
+        tts_engine = requested_engine(request.form)
+        if tts_engine is None:
+            return unknown_engine_response(request.form)
+
+        # 可选的慢速 / 变调版本，由已缓存的原音频在本地生成
+        try:
+            variant = parse_variant(request.form.get('speed'), request.form.get('pitch'))
+        except ValueError as e:
+            return jsonify({'error': f'无效的变速参数: {str(e)}'}), 400
+
+        try:
+            audio_file, strategy = await ensure_audio(pinyin, hanzi, tts_engine)
+        except SynthesisBackoff as e:
+            # 返回重试时间，客户端据此退避；合成本身失败返回 500，被负缓存拦截返回 503
+            logger.error(f'音频合成错误: {str(e)}', extra={'model': tts_engine, 'route': 'get_audio'})
+            status = 503 if e.short_circuited else 500
+            response = jsonify({'error': str(e), 'retry_after': e.retry_after, 'last_error': e.last_error})
+            response.headers['Retry-After'] = str(max(1, int(round(e.retry_after))))
+            return response, status
+        except Exception as e:
+            logger.error(f'音频合成错误: {str(e)}', extra={'model': tts_engine, 'route': 'get_audio'})
+            return jsonify({'error': f'音频合成失败: {str(e)}'}), 500
+
+        if variant is not None:
+            try:
+                audio_file = await ensure_variant(audio_file, tts_engine, *variant)
+            except VariantUnavailable as e:
+                return jsonify({'error': str(e)}), 501
+            except Exception as e:
+                logger.error(f'变速音频生成错误: {str(e)}', extra={'model': tts_engine, 'route': 'get_audio'})
+                return jsonify({'error': f'变速音频生成失败: {str(e)}'}), 500
+
+        audio_url = audio_url_for(audio_file)
         last_audio_url = audio_url
+        prefetcher.observe(g.client_id, pinyin, tts_engine)
         
         # 记录 TTS 模型使用情况
         model_name = getattr(strategy, 'name', tts_engine)
-        logger.info(f'请求生成音频: {pinyin} -> {model_name}', extra={'model': model_name})
-
-        return jsonify({'audio_url': audio_url})  # 返回 JSON 格式
+        logger.info(f'请求生成音频: {requested} -> {pinyin} -> {model_name}',
+                    extra={'model': model_name, 'route': 'get_audio'})
+
+        return jsonify({'audio_url': audio_url, 'pinyin': pinyin})  # 返回 JSON 格式
+
+    @app.route('/long_audio', methods=['GET', 'POST'])
+    async def long_audio():
+        """
+        长文本朗读：按标点分句并发合成，按原文顺序边合成边返回拼接后的音频流。
+
+        页面使用 POST 提交文本（长文本放在查询字符串中会超出代理的 URL 长度限制）；
+        短文本也可以用 GET 直接作为 <audio> 的 src。浏览器收到第一句即可开始播放。
+
+        响应开始后失败的分句会被跳过，X-Long-Text-Id 头给出任务 id，
+        播放结束后可通过 /long_audio/status/<id> 查询跳过了哪些分句。
+        """
+        values = request.values
+        text = values.get('text', '').strip()
+        if not text:
+            return jsonify({'error': '请输入文本'}), 400
+        if len(text) > long_text_max_chars:
+            return jsonify({'error': f'文本不能超过 {long_text_max_chars} 个字符'}), 400
+        tts_engine = requested_engine(values)
+        if tts_engine is None:
+            return unknown_engine_response(values)
+        chunks = split_text(text)
+        if not chunks:
+            return jsonify({'error': '文本中没有可朗读的内容'}), 400
+
+        futures = long_text.submit(chunks, tts_engine)
+        # 等第一句完成后再开始响应，第一句失败时仍能返回错误状态
+        try:
+            with span('first_chunk', chunks=len(chunks)):
+                await asyncio.wrap_future(futures[0])
+        except SynthesisBackoff as e:
+            for future in futures:
+                future.cancel()
+            logger.error(f'长文本合成错误: {str(e)}', extra={'model': tts_engine, 'route': 'long_audio'})
+            status = 503 if e.short_circuited else 500
+            response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+            response.headers['Retry-After'] = str(max(1, int(round(e.retry_after))))
+            return response, status
+        except Exception as e:
+            for future in futures:
+                future.cancel()
+            logger.error(f'长文本合成错误: {str(e)}', extra={'model': tts_engine, 'route': 'long_audio'})
+            return jsonify({'error': f'音频合成失败: {str(e)}'}), 500
+
+        logger.info(f'长文本朗读: {len(text)} 字, {len(chunks)} 句',
+                    extra={'model': tts_engine, 'route': 'long_audio'})
+        mimetype = 'audio/wav' if audio_file_for('', tts_engine).endswith('.wav') else 'audio/mpeg'
+        job_id = uuid.uuid4().hex
+        response = app.response_class(
+            long_text.stream(futures, lambda audio_file: os.path.join(AUDIO_DIR, audio_file), job_id=job_id),
+            mimetype=mimetype)
+        response.headers['X-Chunk-Count'] = str(len(chunks))
+        response.headers['X-Long-Text-Id'] = job_id
+        return response
+
+    @app.route('/long_audio/status/<job_id>')
+    def long_audio_status(job_id):
+        """
+        查询长文本朗读任务的进度和被跳过的分句（任务状态保存在处理该请求的进程中）。
+        """
+        status = long_text.status(job_id)
+        if status is None:
+            return jsonify({'error': '任务不存在'}), 404
+        return jsonify(status)
+
+    @app.route('/build_sprite', methods=['POST'])
+    async def build_sprite_route():
+        """
+        为一组拼音（默认为当前词表全部拼音）生成音频包和偏移量清单。
+
+        需要管理员令牌：未指定拼音时会合成整个词表并覆盖共享的音频包。
+        缺失的音频按 SPRITE_BUILD_CONCURRENCY 分批并发合成。
+        """
+        denied = require_admin()
+        if denied:
+            return denied
+        name = request.form.get('name', 'all')
+        if not name.replace('-', '').replace('_', '').isalnum():
+            return jsonify({'error': '音频包名称只能包含字母、数字、- 和 _'}), 400
+        tts_engine = requested_engine(request.form)
+        if tts_engine is None:
+            return unknown_engine_response(request.form)
+        pinyins = [p.strip() for p in request.form.get('pinyins', '').split(',') if p.strip()]
+        mapping = lexicon.current().mapping
+        if not pinyins:
+            pinyins = list(mapping)
+
+        async def synthesize(pinyin):
+            hanzi = mapping.get(pinyin, pinyin)
+            try:
+                audio_file, _ = await ensure_audio(pinyin, hanzi, tts_engine)
+            except Exception as e:
+                logger.warning(f'音频包合成错误: {pinyin}: {str(e)}', extra={'model': tts_engine})
+                return pinyin, hanzi, None
+            return pinyin, hanzi, audio_file
+
+        results = []
+        for start in range(0, len(pinyins), sprite_build_concurrency):
+            results.extend(await asyncio.gather(
+                *(synthesize(pinyin) for pinyin in pinyins[start:start + sprite_build_concurrency])))
+
+        clips = [(pinyin, hanzi, os.path.join(AUDIO_DIR, audio_file))
+                 for pinyin, hanzi, audio_file in results if audio_file is not None]
+        failed = [pinyin for pinyin, _, audio_file in results if audio_file is None]
+        manifest = build_sprite(name, tts_engine, clips)
+        manifest['failed'] = failed
+        logger.info(f'生成音频包: {name} ({len(manifest["clips"])} 段)', extra={'model': tts_engine})
+        return jsonify(manifest)
+
+    @app.route('/sprite/<name>/<engine>.json')
+    def sprite_manifest(name, engine):
+        manifest = load_manifest(name, engine)
+        if manifest is None:
+            return jsonify({'error': '音频包不存在'}), 404
+        manifest['url'] = f'/sprite/{name}/{engine}.bin?v={manifest["version"]}'
+        return jsonify(manifest)
+
+    @app.route('/sprite/<name>/<engine>.bin')
+    def sprite_data(name, engine):
+        # 带版本号的请求只在版本与当前清单一致时返回，否则客户端拿到的数据与其清单的偏移量不符
+        version = request.args.get('v')
+        if version:
+            manifest = load_manifest(name, engine)
+            if manifest is None or manifest['version'] != version:
+                return jsonify({'error': '音频包已更新，请重新加载清单'}), 404
+        data_path, _ = sprite_paths(name, engine)
+        directory, filename = os.path.split(data_path)
+        # 客户端支持 gzip 时直接返回预压缩文件
+        if 'gzip' in request.headers.get('Accept-Encoding', '') and os.path.exists(f'{data_path}.gz'):
+            response = send_from_directory(directory, f'{filename}.gz', mimetype='application/octet-stream')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = send_from_directory(directory, filename, mimetype='application/octet-stream')
+        response.headers['Vary'] = 'Accept-Encoding'
+        # URL 中带当前版本号，内容不变，可长期缓存
+        if version:
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+    @app.route('/suggest')
+    def suggest():
+        prefix = request.args.get('prefix', '')[:16]
+        k = min(max(request.args.get('k', 10, type=int), 1), 20)
+        if not prefix:
+            return jsonify({'prefix': prefix, 'suggestions': []})
+        snapshot = lexicon.current()
+        suggestions = [{'pinyin': pinyin, 'hanzi': hanzi}
+                       for pinyin, hanzi in snapshot.suggest_index.suggest(prefix, k)]
+        response = jsonify({'prefix': prefix, 'suggestions': suggestions})
+        # 结果只随词表变化，允许浏览器和代理缓存
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        response.headers['X-Lexicon-Version'] = str(snapshot.version)
+        return response
 
     @app.route('/play_last_audio')
     def play_last_audio():
@@ -139,11 +635,27 @@ def create_app():
         else:
             return jsonify({'error': '没有可播放的音频'}), 400
 
+    @app.route('/tts_engines')
+    def tts_engines():
+        # 各引擎的加载状态和导入/初始化耗时
+        return jsonify({'default': tts_strategies.default, 'engines': tts_strategies.stats(),
+                        'failures': failure_cache.stats()})
+
     @app.route('/audio/<filename>')
     def audio(filename):
         # 记录播放具体音频时使用的模型（从文件名中提取）
         model_name = filename.split('_')[0] if '_' in filename else 'unknown'
-        logger.info(f'播放音频: {filename}', extra={'model': model_name})
+        logger.info(f'播放音频: {filename}', extra={'model': model_name, 'route': 'audio'})
+        # 写入中的临时文件等隐藏文件不对外提供
+        if filename.startswith('.'):
+            abort(404)
+        if AUDIO_SERVE_MODE == 'accel':
+            # 只做存在性检查，文件内容由 nginx 发送
+            if safe_join(AUDIO_DIR, filename) is None or not os.path.isfile(os.path.join(AUDIO_DIR, filename)):
+                abort(404)
+            response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = AUDIO_ACCEL_PREFIX + quote(filename)
+            return response
         return send_from_directory(AUDIO_DIR, filename)
 
     return app
@@ -151,25 +663,11 @@ def create_app():
 # 创建Flask应用实例（必须在日志配置之前）
 app = Flask(__name__)
 
-# 配置日志系统
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-# 创建控制台处理器并设置级别
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-
-# 创建格式化器并应用过滤器
-formatter = TTSLogFormatter('[%(asctime)s] 使用模型: %(model)s')
-console_handler.setFormatter(formatter)
-console_handler.addFilter(ModelLogFilter())
-
-# 添加处理器到记录器
-logger.addHandler(console_handler)
+# 配置日志系统：请求线程只入队，由后台线程负责输出
+logger = configure_logging()
 
 # 将Flask日志与自定义配置整合
-werkzeug_logger = logging.getLogger('werkzeug')
-werkzeug_logger.disabled = True
+logging.getLogger('werkzeug').disabled = True
 app.logger = logger  # 将Flask内置日志替换为自定义配置
 
 # 添加调试信息
@@ -178,59 +676,20 @@ print(f"当前工作目录: {os.getcwd()}")
 print(f"音频输出目录: {AUDIO_DIR}")
 print(f"音频输出目录状态: {'可写' if os.access(AUDIO_DIR, os.W_OK) else '不可写'}")
 
-# 设置全局日志级别为DEBUG
-logging.basicConfig(level=logging.DEBUG)
-
-# 完全禁用werkzeug日志
-logging.getLogger('werkzeug').disabled = True
-
-# 完全重构日志系统配置
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-# 创建控制台处理器并设置级别
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-
-# 创建格式化器并应用过滤器
-formatter = TTSLogFormatter('[%(asctime)s] 使用模型: %(model)s')
-console_handler.setFormatter(formatter)
-console_handler.addFilter(ModelLogFilter())
-
-# 添加处理器到记录器
-logger.addHandler(console_handler)
-
-# 替换全局日志配置
-logging.getLogger().handlers = [console_handler]
-logging.getLogger().setLevel(logging.INFO)
-
-# 导入拼音映射
+# 导入拼音映射（词表数据文件不存在时的内置词表）
 from pinyin_map import pinyin_to_hanzi
-
-# 设置日志格式
-class TTSLogFormatter(logging.Formatter):
-    def format(self, record):
-        if not hasattr(record, 'model'):
-            record.model = 'unknown'
-        return super().format(record)
-
-# 临时修改日志格式包含更多调试信息
-formatter = TTSLogFormatter('[%(asctime)s] 使用模型: %(model)s [%(name)s:%(lineno)d]')
-handler = logging.StreamHandler()
-handler.setFormatter(formatter)
-
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-logger.addHandler(handler)
-
-# 确保所有日志记录器都应用过滤器
-for handler in logging.getLogger().handlers:
-    handler.addFilter(ModelLogFilter())
-
-# 可选：写入日志文件
-# file_handler = logging.FileHandler('tts_usage.log')
-# file_handler.setFormatter(formatter)
-# logger.addHandler(file_handler)
+from lexicon import Lexicon
+from audio_sprite import build_sprite, load_manifest, sprite_paths, remove_sprites_containing
+from pinyin_fuzzy import resolve_pinyin, normalize_pinyin
+from tts_registry import StrategyRegistry
+from failure_cache import FailureCache, SynthesisBackoff
+from prefetch import prefetcher_from_env
+from long_text import LongTextSynthesizer, split_text
+from cache_integrity import CacheIndex, CacheScrubber, temp_path_for, validate_clip
+from audio_variants import (parse_variant, parse_variant_file, variant_file_for, render_variant,
+                            VariantUnavailable)
+from tracing import (span, start_trace, finish_trace, server_timing, export_chrome_trace,
+                     RequestProfiler, RECENT_TRACES)
 
 if __name__ == '__main__':
     # 确保应用实例正确运行
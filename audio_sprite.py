@@ -0,0 +1,139 @@
+import os
+import json
+import gzip
+import hashlib
+import time
+
+from audio_utils import audio_format, probe_duration
+
+# 音频包输出目录
+SPRITE_DIR = 'static/sprites'
+
+
+def sprite_paths(name: str, engine: str, sprite_dir: str = None):
+    """
+    返回音频包数据文件和清单文件的路径。
+
+    参数:
+        name (str): 音频包名称（如课程名）。
+        engine (str): TTS 引擎名称。
+        sprite_dir (str): 输出目录，默认为 SPRITE_DIR。
+
+    返回:
+        tuple: (数据文件路径, 清单文件路径)
+    """
+    base = os.path.join(sprite_dir or SPRITE_DIR, f'{name}_{engine}')
+    return f'{base}.bin', f'{base}.json'
+
+
+def build_sprite(name: str, engine: str, clips, sprite_dir: str = None):
+    """
+    将多个已缓存的音频片段打包为一个数据文件，并生成偏移量清单。
+
+    前端只需下载一次数据文件，按清单中的 offset/length 切片解码即可播放，
+    之后整节课的播放不再产生网络请求。
+
+    参数:
+        name (str): 音频包名称。
+        engine (str): TTS 引擎名称，写入清单供前端校验。
+        clips (list): (拼音, 汉字, 音频文件路径) 元组列表，按播放顺序排列。
+        sprite_dir (str): 输出目录，默认为 SPRITE_DIR。
+
+    返回:
+        dict: 清单内容，同时写入 .json 文件。
+    """
+    data_path, manifest_path = sprite_paths(name, engine, sprite_dir)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+    entries = {}
+    missing = []
+    digest = hashlib.sha1()
+    offset = 0
+    tmp_path = f'{data_path}.tmp'
+    with open(tmp_path, 'wb') as out:
+        for pinyin, hanzi, audio_path in clips:
+            if pinyin in entries:
+                continue
+            # 空文件或不存在的文件不打包，由调用方决定是否重新合成
+            if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+                missing.append(pinyin)
+                continue
+            with open(audio_path, 'rb') as f:
+                data = f.read()
+            out.write(data)
+            digest.update(data)
+            entries[pinyin] = {
+                'hanzi': hanzi,
+                'offset': offset,
+                'length': len(data),
+                'format': audio_format(audio_path),
+                'duration': probe_duration(audio_path),
+            }
+            offset += len(data)
+    os.replace(tmp_path, data_path)
+
+    # 预压缩一份 gzip 版本（wav 片段压缩效果明显），同样先写临时文件再原子替换，
+    # 正在下载旧版本的客户端不会读到写了一半的压缩文件
+    tmp_gz = f'{data_path}.gz.tmp'
+    with open(data_path, 'rb') as f, gzip.open(tmp_gz, 'wb', compresslevel=9) as gz:
+        gz.write(f.read())
+    os.replace(tmp_gz, f'{data_path}.gz')
+
+    manifest = {
+        'name': name,
+        'engine': engine,
+        'version': digest.hexdigest()[:12],
+        'size': offset,
+        'created': int(time.time()),
+        'clips': entries,
+        'missing': missing,
+    }
+    tmp_manifest = f'{manifest_path}.tmp'
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_manifest, manifest_path)
+    return manifest
+
+
+def load_manifest(name: str, engine: str, sprite_dir: str = None):
+    """
+    读取已生成的音频包清单，不存在时返回 None。
+    """
+    _, manifest_path = sprite_paths(name, engine, sprite_dir)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def remove_sprites_containing(pinyins, sprite_dir: str = None):
+    """
+    删除包含任一指定拼音的音频包（数据、压缩副本和清单），返回被删除的清单路径。
+
+    词表中某个拼音的汉字变化后，包含旧音频的音频包随之失效，需要重新生成。
+    """
+    sprite_dir = sprite_dir or SPRITE_DIR
+    if not os.path.isdir(sprite_dir):
+        return []
+    pinyins = set(pinyins)
+    removed = []
+    for filename in os.listdir(sprite_dir):
+        if not filename.endswith('.json'):
+            continue
+        manifest_path = os.path.join(sprite_dir, filename)
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                clips = json.load(f).get('clips', {})
+        except (OSError, ValueError):
+            continue
+        if pinyins.isdisjoint(clips):
+            continue
+        base = manifest_path[:-len('.json')]
+        # 先删清单，客户端不会拿到指向已删除数据的清单
+        for path in (manifest_path, f'{base}.bin', f'{base}.bin.gz'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        removed.append(manifest_path)
+    return removed
@@ -0,0 +1,118 @@
+import os
+import wave
+
+# MPEG 音频帧头解析所需的码率表（kbps），按 (版本, 层) 索引
+_MP3_BITRATES = {
+    ('1', 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    ('1', 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    ('1', 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    ('2', 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    ('2', 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    ('2', 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# 采样率表（Hz），按版本索引
+_MP3_SAMPLE_RATES = {
+    '1': [44100, 48000, 32000],
+    '2': [22050, 24000, 16000],
+    '2.5': [11025, 12000, 8000],
+}
+
+
+def audio_format(path: str) -> str:
+    """
+    根据文件扩展名返回音频格式（'mp3' / 'wav' 等）。
+    """
+    return os.path.splitext(path)[1].lstrip('.').lower()
+
+
+def _skip_id3(data: bytes) -> int:
+    # 跳过文件开头的 ID3v2 标签
+    if len(data) >= 10 and data[:3] == b'ID3':
+        size = ((data[6] & 0x7f) << 21) | ((data[7] & 0x7f) << 14) | \
+               ((data[8] & 0x7f) << 7) | (data[9] & 0x7f)
+        return 10 + size
+    return 0
+
+
+def strip_id3(data: bytes) -> bytes:
+    """
+    去掉 mp3 开头的 ID3v2 标签，只保留音频帧，便于多段直接拼接。
+    """
+    return data[_skip_id3(data):]
+
+
+def _mp3_duration(data: bytes):
+    """
+    逐帧解析 MPEG 帧头累计时长，无法识别任何帧时返回 None。
+    """
+    pos = _skip_id3(data)
+    total = 0.0
+    frames = 0
+    while pos + 4 <= len(data):
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        if data[pos] != 0xff or (b1 & 0xe0) != 0xe0:
+            # 不是帧同步字，继续向后查找
+            pos += 1
+            continue
+
+        version_bits = (b1 >> 3) & 0x03
+        layer_bits = (b1 >> 1) & 0x03
+        bitrate_index = (b2 >> 4) & 0x0f
+        rate_index = (b2 >> 2) & 0x03
+        padding = (b2 >> 1) & 0x01
+        if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+            pos += 1
+            continue
+
+        version = {0: '2.5', 2: '2', 3: '1'}[version_bits]
+        layer = 4 - layer_bits
+        bitrate = _MP3_BITRATES[('1' if version == '1' else '2', layer)][bitrate_index] * 1000
+        sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+
+        if layer == 1:
+            samples = 384
+            frame_length = (12 * bitrate // sample_rate + padding) * 4
+        else:
+            samples = 1152 if (layer == 2 or version == '1') else 576
+            frame_length = samples // 8 * bitrate // sample_rate + padding
+
+        if frame_length <= 0:
+            pos += 1
+            continue
+
+        total += samples / sample_rate
+        frames += 1
+        pos += frame_length
+
+    return round(total, 3) if frames else None
+
+
+def _wav_duration(path: str):
+    try:
+        with wave.open(path, 'rb') as wav_file:
+            rate = wav_file.getframerate()
+            if not rate:
+                return None
+            return round(wav_file.getnframes() / rate, 3)
+    except (wave.Error, EOFError):
+        return None
+
+
+def probe_duration(path: str):
+    """
+    读取音频文件头计算时长（秒），不依赖任何解码库。
+
+    参数:
+        path (str): 音频文件路径，支持 .mp3 和 .wav。
+
+    返回:
+        float | None: 时长（秒），格式不支持或文件损坏时返回 None。
+    """
+    fmt = audio_format(path)
+    if fmt == 'wav':
+        return _wav_duration(path)
+    if fmt == 'mp3':
+        with open(path, 'rb') as f:
+            return _mp3_duration(f.read())
+    return None
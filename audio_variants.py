@@ -0,0 +1,112 @@
+import os
+import math
+import wave
+
+from cache_integrity import temp_path_for
+
+# 允许的变速和变调范围；超出范围的参数直接拒绝，避免生成大量无用缓存
+MIN_SPEED, MAX_SPEED = 0.5, 2.0
+MAX_PITCH = 12
+
+
+class VariantUnavailable(RuntimeError):
+    """
+    未安装 librosa / numpy，无法生成变速变调音频。
+    """
+
+
+def variants_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+        import librosa  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parse_variant(speed=None, pitch=None):
+    """
+    校验并规范化变体参数。
+
+    参数:
+        speed: 播放速度倍数，如 0.75 表示放慢到 0.75 倍，默认 1。
+        pitch: 音高变化（半音），默认 0。
+
+    返回:
+        tuple: (speed, pitch)；两者都是默认值时返回 None，表示使用原音频。
+
+    异常:
+        ValueError: 参数无法解析或超出范围。
+    """
+    speed = float(speed) if speed not in (None, '') else 1.0
+    pitch = float(pitch) if pitch not in (None, '') else 0.0
+    # inf / nan 无法取整（round(inf) 抛出 OverflowError），按无效参数处理
+    if not (math.isfinite(speed) and math.isfinite(pitch)):
+        raise ValueError('变速参数必须是有限数值')
+    speed, pitch = round(speed, 2), int(round(pitch))
+    if not MIN_SPEED <= speed <= MAX_SPEED:
+        raise ValueError(f'速度必须在 {MIN_SPEED} 到 {MAX_SPEED} 之间')
+    if abs(pitch) > MAX_PITCH:
+        raise ValueError(f'音高变化必须在 ±{MAX_PITCH} 个半音之内')
+    if speed == 1.0 and pitch == 0:
+        return None
+    return speed, pitch
+
+
+def variant_file_for(audio_file: str, speed: float, pitch: int) -> str:
+    """
+    返回变体的缓存文件名，如 chun.mp3@0.75x.wav、chun.mp3@1x+2st.wav。
+
+    文件名包含原音频的扩展名，不同引擎（mp3 / wav）的变体互不覆盖。
+    """
+    suffix = f'{speed:g}x'
+    if pitch:
+        suffix += f'{pitch:+d}st'
+    return f'{audio_file}@{suffix}.wav'
+
+
+def parse_variant_file(filename: str):
+    """
+    variant_file_for 的逆操作，返回 (原音频文件名, speed, pitch)；不是变体文件时返回 None。
+    """
+    if '@' not in filename or not filename.endswith('.wav'):
+        return None
+    audio_file, _, suffix = filename[:-len('.wav')].rpartition('@')
+    speed_text, _, pitch_text = suffix.partition('x')
+    try:
+        return audio_file, float(speed_text), int(pitch_text[:-len('st')]) if pitch_text else 0
+    except ValueError:
+        return None
+
+
+def render_variant(source_path: str, output_path: str, speed: float, pitch: int):
+    """
+    从已缓存的音频在本地生成变速（保持音高）和变调版本，输出 16 位 PCM wav。
+
+    先写临时文件再原子替换，与合成缓存的写入方式一致。
+    """
+    try:
+        import numpy as np
+        import librosa
+    except ImportError as e:
+        raise VariantUnavailable('生成变速音频需要安装 librosa 和 numpy') from e
+
+    samples, sample_rate = librosa.load(source_path, sr=None, mono=True)
+    if speed != 1.0:
+        samples = librosa.effects.time_stretch(samples, rate=speed)
+    if pitch:
+        samples = librosa.effects.pitch_shift(samples, sr=sample_rate, n_steps=pitch)
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+
+    tmp_path = temp_path_for(output_path)
+    try:
+        with wave.open(tmp_path, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(pcm.tobytes())
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return round(len(pcm) / sample_rate, 3)
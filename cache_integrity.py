@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import hashlib
+import threading
+import logging
+from contextlib import contextmanager
+
+from audio_utils import probe_duration
+
+logger = logging.getLogger(__name__)
+
+# 旁路索引、隔离目录和锁文件放在缓存状态目录（CACHE_STATE_DIR）中，不在对外提供的静态目录下：
+# 索引包含所有合成过的文本（含用户输入的长文本），不能被公开访问
+INDEX_FILENAME = 'index.json'
+QUARANTINE_DIRNAME = 'quarantine'
+INDEX_LOCK_FILENAME = 'index.lock'
+SCRUB_LOCK_FILENAME = 'scrub.lock'
+# 旧版本放在音频目录中的索引，启动时迁移到状态目录
+LEGACY_INDEX_FILENAME = '.index.json'
+
+# 原子写入时的临时文件前缀，保留原扩展名（部分 TTS 工具按扩展名决定输出格式）
+TMP_PREFIX = '.tmp-'
+
+
+def temp_path_for(audio_path: str) -> str:
+    """
+    返回与 audio_path 同目录、同扩展名的临时文件路径，合成完成后用 os.replace 替换到位。
+    """
+    directory, filename = os.path.split(audio_path)
+    return os.path.join(directory, f'{TMP_PREFIX}{uuid.uuid4().hex[:8]}-{filename}')
+
+
+def file_checksum(path: str, chunk_size: int = 64 * 1024, throttle=None) -> str:
+    """
+    计算文件的 sha256。throttle(n) 在每读取 n 字节后调用，用于限速。
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            if throttle:
+                throttle(len(chunk))
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True):
+    """
+    对 path 加进程间排他锁（flock），多个 worker 共用同一缓存目录时使用。
+
+    非阻塞模式下锁被其他进程持有时产出 False。
+    """
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def validate_clip(path: str):
+    """
+    检查音频文件是否可以提供：非空且文件头可解析出正的时长。
+
+    返回:
+        tuple: (时长, 错误原因)，有效时错误原因为 None。
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError as e:
+        return None, f'无法读取: {e}'
+    if size == 0:
+        return None, '空文件'
+    duration = probe_duration(path)
+    if not duration:
+        return None, '无法解析音频帧'
+    return duration, None
+
+
+class CacheIndex:
+    """
+    音频缓存的旁路校验索引（缓存状态目录下的 index.json）。
+
+    每个缓存文件记录 sha256、大小、时长、生成引擎和合成文本。写入时登记，
+    巡检时据此发现被截断或被改写的文件；引擎和文本用于重新合成。
+
+    多个 worker 进程共用同一个索引文件：每个进程只记录自己的修改，flush() 在文件锁内
+    重新读取磁盘上的索引、合并本进程的修改后写回，并用合并结果刷新内存中的索引，
+    不会覆盖其他进程登记的条目。
+    """
+
+    def __init__(self, audio_dir: str, state_dir: str):
+        self.audio_dir = audio_dir
+        self.state_dir = state_dir
+        self.path = os.path.join(state_dir, INDEX_FILENAME)
+        self.lock_path = os.path.join(state_dir, INDEX_LOCK_FILENAME)
+        os.makedirs(state_dir, exist_ok=True)
+        legacy_path = os.path.join(audio_dir, LEGACY_INDEX_FILENAME)
+        if os.path.exists(legacy_path) and not os.path.exists(self.path):
+            shutil.move(legacy_path, self.path)
+        # 本进程尚未写回的修改: 文件名 -> 条目（None 表示删除）
+        self._changes = {}
+        self._lock = threading.Lock()
+        self._entries = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, filename: str):
+        with self._lock:
+            return self._entries.get(filename)
+
+    def record(self, filename: str, engine: str, duration: float = None, checksum: str = None,
+               text: str = None):
+        path = os.path.join(self.audio_dir, filename)
+        entry = {
+            'sha256': checksum or file_checksum(path),
+            'size': os.path.getsize(path),
+            'duration': duration,
+            'engine': engine,
+            'created': int(time.time()),
+        }
+        if text is not None:
+            entry['text'] = text
+        with self._lock:
+            self._entries[filename] = entry
+            self._changes[filename] = entry
+        return entry
+
+    def discard(self, filename: str):
+        with self._lock:
+            if self._entries.pop(filename, None) is not None:
+                self._changes[filename] = None
+
+    def filenames(self):
+        with self._lock:
+            return list(self._entries)
+
+    def flush(self):
+        """
+        在文件锁内合并磁盘上的索引和本进程的修改，原子写回，并刷新内存中的索引。
+        """
+        with file_lock(self.lock_path):
+            with self._lock:
+                changes, self._changes = self._changes, {}
+            entries = self._read()
+            for filename, entry in changes.items():
+                if entry is None:
+                    entries.pop(filename, None)
+                else:
+                    entries[filename] = entry
+            if changes:
+                tmp_path = temp_path_for(self.path)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps(entries, ensure_ascii=False, sort_keys=True))
+                os.replace(tmp_path, self.path)
+            with self._lock:
+                # 合并期间本进程新增的修改仍以内存中的为准
+                for filename, entry in self._changes.items():
+                    if entry is None:
+                        entries.pop(filename, None)
+                    else:
+                        entries[filename] = entry
+                self._entries = entries
+
+
+class CacheScrubber:
+    """
+    后台巡检音频缓存。
+
+    定期遍历缓存目录：未登记的文件解析文件头后补登记，已登记的文件核对大小和 sha256。
+    损坏的文件移入状态目录下的 quarantine 目录（请求路径随之视为未命中），再由 resynthesize
+    回调（参数为文件名和原索引条目）逐个重新合成。读取按 bytes_per_sec 限速，
+    每个文件之间也会让出时间片，避免与正常请求争抢磁盘。
+
+    多个 worker 进程各自启动巡检线程，但同一时间只有拿到巡检锁的进程执行扫描；
+    其余进程只按 sync_interval 把自己的索引修改合并写回。
+    """
+
+    def __init__(self, audio_dir: str, index: CacheIndex, resynthesize=None,
+                 interval: float = 3600, bytes_per_sec: int = 1024 * 1024, pause: float = 0.01,
+                 sync_interval: float = 60):
+        self.audio_dir = audio_dir
+        self.index = index
+        self.resynthesize = resynthesize
+        self.interval = interval
+        self.bytes_per_sec = bytes_per_sec
+        self.pause = pause
+        self.sync_interval = sync_interval
+        self.quarantine_dir = os.path.join(index.state_dir, QUARANTINE_DIRNAME)
+        self.lock_path = os.path.join(index.state_dir, SCRUB_LOCK_FILENAME)
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_report = {}
+
+    def _throttle(self, nbytes):
+        if self.bytes_per_sec > 0:
+            self._stop.wait(nbytes / self.bytes_per_sec)
+
+    def check(self, filename: str):
+        """
+        校验单个缓存文件，返回错误原因，正常时返回 None。
+        """
+        path = os.path.join(self.audio_dir, filename)
+        entry = self.index.get(filename)
+        if entry is not None:
+            reason = self._compare(path, entry)
+            if reason is not None:
+                # 其他进程可能刚重新合成了该文件，合并最新索引后再核对一次
+                self.index.flush()
+                entry = self.index.get(filename)
+                if entry is not None:
+                    reason = self._compare(path, entry)
+            if entry is not None:
+                return reason
+        duration, error = validate_clip(path)
+        if error is None:
+            self.index.record(filename, None, duration, file_checksum(path, throttle=self._throttle))
+        return error
+
+    def _compare(self, path, entry):
+        try:
+            if os.path.getsize(path) != entry['size']:
+                return '大小与索引不一致'
+            if file_checksum(path, throttle=self._throttle) != entry['sha256']:
+                return '校验和与索引不一致'
+        except OSError as e:
+            return f'无法读取: {e}'
+        return None
+
+    def quarantine(self, filename: str, reason: str):
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        target = os.path.join(self.quarantine_dir, f'{int(time.time())}-{filename}')
+        try:
+            # 状态目录可能与音频目录不在同一文件系统
+            shutil.move(os.path.join(self.audio_dir, filename), target)
+        except FileNotFoundError:
+            pass
+        entry = self.index.get(filename)
+        self.index.discard(filename)
+        logger.warning(f'缓存文件已隔离: {filename} ({reason})')
+        return entry
+
+    def scan(self):
+        """
+        完整巡检一遍，返回统计结果；其他进程正在巡检时只合并索引并跳过。
+        """
+        with file_lock(self.lock_path, blocking=False) as acquired:
+            if not acquired:
+                self.index.flush()
+                return {'skipped': '其他进程正在巡检'}
+            return self._scan()
+
+    def _scan(self):
+        report = {'checked': 0, 'quarantined': [], 'repaired': 0, 'pruned': 0}
+        # 先合并其他进程登记的条目，避免用过期的校验和隔离正常文件
+        self.index.flush()
+        try:
+            filenames = sorted(name for name in os.listdir(self.audio_dir)
+                               if not name.startswith('.')
+                               and os.path.isfile(os.path.join(self.audio_dir, name)))
+        except OSError:
+            return report
+
+        bad = []
+        for filename in filenames:
+            if self._stop.is_set():
+                break
+            report['checked'] += 1
+            reason = self.check(filename)
+            if reason is not None:
+                entry = self.quarantine(filename, reason)
+                bad.append((filename, entry))
+                report['quarantined'].append(filename)
+            self._stop.wait(self.pause)
+
+        # 文件已被删除（如词表更新后失效）的索引条目
+        present = set(filenames)
+        for filename in self.index.filenames():
+            if filename not in present and not os.path.exists(os.path.join(self.audio_dir, filename)):
+                self.index.discard(filename)
+                report['pruned'] += 1
+
+        # 扫描完成后再逐个重新合成，优先级低于巡检本身
+        for filename, entry in bad:
+            if self._stop.is_set() or self.resynthesize is None:
+                break
+            try:
+                self.resynthesize(filename, entry)
+                report['repaired'] += 1
+            except Exception as e:
+                logger.warning(f'缓存修复失败: {filename}: {str(e)}')
+            self._stop.wait(self.pause)
+
+        self.index.flush()
+        report['finished'] = int(time.time())
+        self._last_report = report
+        logger.info(f"缓存巡检完成: 检查 {report['checked']} 个, 隔离 {len(report['quarantined'])} 个, "
+                    f"修复 {report['repaired']} 个")
+        return report
+
+    def start(self):
+        """
+        启动后台巡检线程，interval 为 0 时不启动。
+        """
+        if self._thread is not None or self.interval <= 0:
+            return
+
+        def run():
+            # 启动后稍等片刻再开始第一轮，避开冷启动高峰；两轮之间定期把索引修改合并写回
+            next_scan = time.monotonic() + min(self.interval, 30)
+            while not self._stop.wait(max(0, min(self.sync_interval, next_scan - time.monotonic()))):
+                try:
+                    if time.monotonic() >= next_scan:
+                        next_scan = time.monotonic() + self.interval
+                        self.scan()
+                    else:
+                        self.index.flush()
+                except Exception as e:
+                    logger.error(f'缓存巡检出错: {str(e)}')
+
+        self._thread = threading.Thread(target=run, name='cache-scrubber', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {'interval': self.interval, 'bytes_per_sec': self.bytes_per_sec, 'last': self._last_report}
@@ -0,0 +1,145 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class SynthesisBackoff(Exception):
+    """
+    合成请求因失败缓存或重试预算被拒绝，或合成本身失败，retry_after 为建议的重试等待秒数。
+
+    short_circuited 为 True 表示请求被负缓存或重试预算直接拦截、没有调用引擎。
+    """
+
+    def __init__(self, message: str, retry_after: float, last_error: str = None,
+                 short_circuited: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.last_error = last_error
+        self.short_circuited = short_circuited
+
+
+class RetryBudget:
+    """
+    单个引擎的重试预算（令牌桶）。
+
+    对已知失败的 key 或处于失败状态的引擎再次发起合成都算作重试，需要消耗一个令牌；
+    令牌按 rate 每秒补充，最多积累 capacity 个。预算耗尽时请求直接被拒绝，
+    因此引擎故障期间上游流量不会随客户端重试成倍增加。
+    """
+
+    def __init__(self, rate: float = 1.0, capacity: int = 10):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, now=None):
+        """
+        尝试消耗一个令牌，成功返回 0，否则返回下一个令牌可用前的等待秒数。
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate if self.rate > 0 else float('inf')
+
+
+class FailureCache:
+    """
+    合成失败的负缓存，key 与音频缓存一致（引擎 + 音频文件名）。
+
+    每个 key 失败后在 base_ttl * 2^(n-1) 秒内（最长 max_ttl）直接拒绝，不再调用引擎；
+    每个引擎另有一个 RetryBudget 限制故障期间的总重试量。
+    """
+
+    def __init__(self, base_ttl: float = 5.0, max_ttl: float = 300.0, max_entries: int = 10000,
+                 retry_rate: float = 1.0, retry_capacity: int = 10):
+        self.base_ttl = base_ttl
+        self.max_ttl = max_ttl
+        self.max_entries = max_entries
+        self.retry_rate = retry_rate
+        self.retry_capacity = retry_capacity
+        # key -> (连续失败次数, 可重试时间, 最近错误)
+        self._entries = OrderedDict()
+        self._budgets = {}
+        self._engine_failing = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, engine):
+        budget = self._budgets.get(engine)
+        if budget is None:
+            budget = self._budgets[engine] = RetryBudget(self.retry_rate, self.retry_capacity)
+        return budget
+
+    def check(self, engine: str, key: str):
+        """
+        合成前调用。允许合成时直接返回，否则抛出 SynthesisBackoff。
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((engine, key))
+            if entry is not None:
+                failures, retry_at, last_error = entry
+                if now < retry_at:
+                    raise SynthesisBackoff(f'{engine} 合成 {key} 最近失败，稍后重试',
+                                           round(retry_at - now, 1), last_error, short_circuited=True)
+            # 只有重试（已知失败的 key，或引擎当前处于失败状态）才消耗预算
+            if entry is not None or self._engine_failing.get(engine):
+                wait = self._budget(engine).try_acquire(now)
+                if wait:
+                    raise SynthesisBackoff(f'{engine} 重试预算已耗尽，稍后重试',
+                                           round(wait, 1), entry[2] if entry else None,
+                                           short_circuited=True)
+
+    def is_failing(self, engine: str, key: str = None) -> bool:
+        """
+        只查询不消耗预算：引擎处于失败状态，或 key 仍在失败等待期内时返回 True。
+        供预取等可选的合成在调用前判断是否跳过。
+        """
+        with self._lock:
+            if self._engine_failing.get(engine):
+                return True
+            entry = self._entries.get((engine, key)) if key is not None else None
+            return entry is not None and time.monotonic() < entry[1]
+
+    def record_failure(self, engine: str, key: str, error: str):
+        """
+        记录一次失败，返回该 key 的重试等待秒数。
+        """
+        now = time.monotonic()
+        with self._lock:
+            failures = self._entries.pop((engine, key), (0, 0, None))[0] + 1
+            ttl = min(self.max_ttl, self.base_ttl * (2 ** (failures - 1)))
+            self._entries[(engine, key)] = (failures, now + ttl, error)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._engine_failing[engine] = True
+            return ttl
+
+    def record_success(self, engine: str, key: str):
+        with self._lock:
+            self._entries.pop((engine, key), None)
+            self._engine_failing[engine] = False
+
+    def forget(self, keys):
+        """
+        删除这些 key 在所有引擎下的失败记录（如词表更新后文本已变化），返回删除的条数。
+        """
+        keys = set(keys)
+        with self._lock:
+            stale = [entry for entry in self._entries if entry[1] in keys]
+            for entry in stale:
+                del self._entries[entry]
+            return len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'failing_engines': [name for name, failing in self._engine_failing.items() if failing],
+            }
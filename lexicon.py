@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import threading
+import logging
+
+from pinyin_fuzzy import PinyinIndex, VALID_SYLLABLES
+from pinyin_suggest import PrefixIndex
+
+logger = logging.getLogger(__name__)
+
+# 词表数据文件，格式: {"version": 1, "entries": {"拼音": "汉字", ...}}
+LEXICON_FILE = os.environ.get('LEXICON_FILE', 'data/lexicon.json')
+
+
+class LexiconSnapshot:
+    """
+    某一版本的词表及其派生索引，构建完成后不再修改。
+    """
+
+    def __init__(self, version, mapping: dict, source: str):
+        self.version = version
+        self.mapping = mapping
+        self.source = source
+        # 近似匹配覆盖词表和全部合法音节，纠错结果不局限于词表收录的音节
+        self.fuzzy_index = PinyinIndex(set(mapping) | VALID_SYLLABLES)
+        self.suggest_index = PrefixIndex(mapping)
+
+
+def load_file(path: str):
+    """
+    读取词表数据文件，返回 (版本号, 映射)。
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data['entries']
+    if not isinstance(entries, dict) or not all(
+            isinstance(k, str) and isinstance(v, str) for k, v in entries.items()):
+        raise ValueError(f'词表格式错误: {path}')
+    return data.get('version'), entries
+
+
+def diff_keys(old: dict, new: dict):
+    """
+    返回合成文本发生变化的拼音：汉字被修改、被删除或新增的拼音。
+
+    新增的拼音之前按原样透传合成（如 shui.mp3 读作 "shui"），同样需要失效。
+    """
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+
+class Lexicon:
+    """
+    可热更新的词表。
+
+    请求通过 current() 拿到当前快照；reload() 在调用线程中构建新快照（索引等），
+    完成后一次赋值原子替换，读者不会看到半成品。替换后只对合成文本变化的拼音
+    调用 on_change 回调清理对应缓存，其余缓存保持不变。
+    """
+
+    def __init__(self, path: str = None, fallback: dict = None, on_change=None):
+        self.path = path or LEXICON_FILE
+        self.fallback = fallback or {}
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self._snapshot = self._build_initial()
+
+    def _build_initial(self):
+        if os.path.exists(self.path):
+            try:
+                self._mtime = os.path.getmtime(self.path)
+                version, mapping = load_file(self.path)
+                return LexiconSnapshot(version, mapping, self.path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f'词表文件加载失败，使用内置词表: {str(e)}')
+        return LexiconSnapshot(0, dict(self.fallback), 'pinyin_map')
+
+    def current(self) -> LexiconSnapshot:
+        return self._snapshot
+
+    def reload(self, force: bool = False):
+        """
+        重新读取词表文件并原子替换。
+
+        参数:
+            force (bool): 为 False 时文件未修改则跳过。
+
+        返回:
+            dict: 版本号和失效的拼音列表；未更新时返回 None。
+        """
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return None
+            if not force and mtime == self._mtime:
+                return None
+            try:
+                version, mapping = load_file(self.path)
+            except (OSError, ValueError, KeyError) as e:
+                # 保留旧版本继续服务
+                logger.error(f'词表重新加载失败，继续使用版本 {self._snapshot.version}: {str(e)}')
+                self._mtime = mtime
+                return None
+
+            old = self._snapshot
+            new = LexiconSnapshot(version, mapping, self.path)
+            self._snapshot = new
+            self._mtime = mtime
+
+        changed = diff_keys(old.mapping, new.mapping)
+        if changed and self.on_change:
+            self.on_change(changed)
+        logger.info(f'词表已更新: 版本 {old.version} -> {new.version}，{len(changed)} 个拼音失效')
+        return {'version': new.version, 'entries': len(mapping), 'invalidated': changed}
+
+    def reload_async(self, force: bool = False):
+        """
+        在后台线程中构建并替换新词表。
+        """
+        thread = threading.Thread(target=self.reload, args=(force,), daemon=True)
+        thread.start()
+        return thread
+
+    def watch(self, interval: float = 5.0):
+        """
+        启动后台线程定期检查文件修改时间，变化时自动重新加载。
+        """
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.error(f'词表监控出错: {str(e)}')
+
+        self._watcher = threading.Thread(target=run, name='lexicon-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def export(path: str = None, version: int = 1):
+    """
+    将 pinyin_map.pinyin_to_hanzi 导出为词表数据文件。
+    """
+    from pinyin_map import pinyin_to_hanzi
+    path = path or LEXICON_FILE
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'entries': dict(sorted(pinyin_to_hanzi.items()))},
+                  f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == '__main__':
+    # 用法: python lexicon.py export [路径]
+    if len(sys.argv) >= 2 and sys.argv[1] == 'export':
+        print(f"词表已导出到: {export(sys.argv[2] if len(sys.argv) > 2 else None)}")
+    else:
+        print('用法: python lexicon.py export [路径]')
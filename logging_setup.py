@@ -0,0 +1,145 @@
+import os
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+
+# 高频路由的默认采样率（1.0 表示全部记录）
+DEFAULT_SAMPLE_RATES = {
+    'audio': 0.1,
+}
+
+_listener = None
+
+
+def _stop_listener():
+    # 进程退出前把队列中剩余的记录写完
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# 创建日志过滤器来拦截unknown模型日志
+class ModelLogFilter(logging.Filter):
+    def filter(self, record):
+        return getattr(record, 'model', None) != 'unknown'
+
+
+# 设置日志格式
+class TTSLogFormatter(logging.Formatter):
+    def format(self, record):
+        # 未指定模型的记录显示为空
+        if not getattr(record, 'model', None) or record.model == 'unknown':
+            record.model = ''
+        return super().format(record)
+
+
+class JSONLogFormatter(logging.Formatter):
+    """
+    结构化日志格式，每条记录输出一行 JSON。
+    """
+    FIELDS = ('model', 'route', 'duration_ms')
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value not in (None, '', 'unknown'):
+                data[field] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    按路由采样 INFO 及以下级别的日志，WARNING 以上始终保留。
+
+    记录通过 extra={'route': ...} 标明路由，未标明的记录不采样。
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'route', None), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+def _parse_sample_rates(value):
+    # 格式: "audio=0.1,get_audio=1"
+    rates = {}
+    for item in value.split(','):
+        route, _, rate = item.partition('=')
+        if route.strip() and rate.strip():
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+def configure_logging(level=logging.INFO, structured=None, sample_rates=None, log_file=None):
+    """
+    配置异步日志管道，返回应用日志记录器。
+
+    请求线程只把记录放入内存队列（QueueHandler），由后台线程（QueueListener）
+    负责格式化和写入 stdout/文件，请求路径不会因为输出阻塞。
+    重复调用会替换之前的配置，不会重复添加处理器。
+
+    参数:
+        level (int): 日志级别。
+        structured (bool): 是否输出 JSON 结构化日志，默认读取环境变量 LOG_FORMAT=json。
+        sample_rates (dict): 路由采样率，默认读取环境变量 LOG_SAMPLE_RATES。
+        log_file (str): 可选的日志文件路径，默认读取环境变量 LOG_FILE。
+
+    返回:
+        logging.Logger: 应用日志记录器。
+    """
+    global _listener
+    if structured is None:
+        structured = os.environ.get('LOG_FORMAT', '').lower() == 'json'
+    if sample_rates is None:
+        sample_rates = dict(DEFAULT_SAMPLE_RATES)
+        if os.environ.get('LOG_SAMPLE_RATES'):
+            sample_rates.update(_parse_sample_rates(os.environ['LOG_SAMPLE_RATES']))
+    log_file = log_file or os.environ.get('LOG_FILE')
+
+    if structured:
+        formatter = JSONLogFormatter()
+    else:
+        formatter = TTSLogFormatter('[%(asctime)s] 使用模型: %(model)s %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _stop_listener()
+
+    # 采样在入队之前进行，被丢弃的记录不产生任何格式化或 I/O 开销
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(ModelLogFilter())
+    queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    return logging.getLogger('pinyin_trans')
+
+
+atexit.register(_stop_listener)
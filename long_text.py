@@ -0,0 +1,162 @@
+import re
+import wave
+import struct
+import asyncio
+import hashlib
+import threading
+import contextvars
+import logging
+from collections import OrderedDict
+
+from audio_utils import audio_format, strip_id3
+
+logger = logging.getLogger(__name__)
+
+# 分句用的标点：中文和英文的句末、分句标点以及换行
+_CHUNK_PATTERN = re.compile(r'[^。！？；，、：,.!?;:\n]+[。！？；，、：,.!?;:\n]*')
+_TRAILING_PUNCTUATION = '。！？；，、：,.!?;:\n \t'
+
+
+def split_text(text: str, min_chars: int = 2, max_chars: int = 50):
+    """
+    按标点把长文本拆成短句。
+
+    每个分句单独合成和缓存，不同课文中相同的句子（如诗句）可以复用缓存；
+    短于 min_chars 的分句并入下一句，超过 max_chars 的按长度截断。
+    返回的分句去掉了末尾标点，缓存 key 不受标点差异影响。
+    """
+    chunks = []
+    carry = ''
+    for match in _CHUNK_PATTERN.finditer(text):
+        piece = (carry + match.group().strip()).rstrip(_TRAILING_PUNCTUATION).strip()
+        if len(piece) < min_chars:
+            carry = piece
+            continue
+        carry = ''
+        for start in range(0, len(piece), max_chars):
+            chunks.append(piece[start:start + max_chars])
+    if carry:
+        if chunks and len(chunks[-1]) + len(carry) <= max_chars:
+            chunks[-1] += carry
+        else:
+            chunks.append(carry)
+    return chunks
+
+
+def chunk_key(chunk: str) -> str:
+    """
+    分句的缓存 key，用作音频文件名（不含扩展名）。
+    """
+    return 'chunk-' + hashlib.sha1(chunk.encode('utf-8')).hexdigest()[:16]
+
+
+def _wav_stream_header(params) -> bytes:
+    # 总长度未知，RIFF 和 data 长度按流式约定填最大值
+    block_align = params.nchannels * params.sampwidth
+    return b''.join([
+        b'RIFF', struct.pack('<I', 0xffffffff), b'WAVE',
+        b'fmt ', struct.pack('<IHHIIHH', 16, 1, params.nchannels, params.framerate,
+                             params.framerate * block_align, block_align, params.sampwidth * 8),
+        b'data', struct.pack('<I', 0xffffffff),
+    ])
+
+
+def read_chunk_audio(path: str, first: bool):
+    """
+    读取一个分句的音频并转成可直接拼接的字节。
+
+    mp3 去掉 ID3 标签后直接拼接帧；wav 只在第一段输出文件头，之后只输出 PCM 数据。
+    """
+    if audio_format(path) == 'wav':
+        with wave.open(path, 'rb') as wav_file:
+            frames = wav_file.readframes(wav_file.getnframes())
+            return (_wav_stream_header(wav_file.getparams()) if first else b'') + frames
+    with open(path, 'rb') as f:
+        return strip_id3(f.read())
+
+
+class LongTextSynthesizer:
+    """
+    长文本并发合成。
+
+    分句的合成任务提交到独立线程的事件循环并发执行，每个引擎同时进行的合成数
+    不超过 concurrency；stream() 按原文顺序等待每个分句，完成一段输出一段，
+    总延迟接近最慢的那一句而不是所有句子之和。
+    """
+
+    def __init__(self, synthesize, concurrency: int = 4, max_jobs: int = 1000):
+        self.synthesize = synthesize
+        self.concurrency = concurrency
+        self.max_jobs = max_jobs
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._semaphores = {}
+        # 最近的朗读任务状态: 任务 id -> 分句数、已输出数、跳过的分句序号
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='long-text', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _run(self, chunk, tts_engine):
+        # 信号量在事件循环线程中创建和使用
+        semaphore = self._semaphores.get(tts_engine)
+        if semaphore is None:
+            semaphore = self._semaphores[tts_engine] = asyncio.Semaphore(self.concurrency)
+        async with semaphore:
+            return await self.synthesize(chunk_key(chunk), chunk, tts_engine)
+
+    def submit(self, chunks, tts_engine):
+        """
+        提交全部分句，返回按原文顺序排列的 concurrent.futures.Future。
+        """
+        loop = self._ensure_loop()
+        # 在空的上下文中调度：分句在请求结束后仍可能在合成，不能把 span 记入已完成的请求追踪
+        context = contextvars.Context()
+        return [context.run(asyncio.run_coroutine_threadsafe, self._run(chunk, tts_engine), loop)
+                for chunk in chunks]
+
+    def stream(self, futures, audio_dir_path, timeout: float = 60, job_id: str = None):
+        """
+        按顺序产出各分句的音频字节。audio_dir_path(audio_file) 返回缓存文件路径。
+
+        某一句合成失败时跳过该句并记录日志（响应已经开始发送，无法再返回错误）；
+        指定 job_id 时跳过的分句序号记录在任务状态中，客户端播放完后可通过 status() 查询。
+        """
+        status = {'chunks': len(futures), 'streamed': 0, 'skipped': [], 'done': False}
+        if job_id is not None:
+            with self._jobs_lock:
+                self._jobs[job_id] = status
+                while len(self._jobs) > self.max_jobs:
+                    self._jobs.popitem(last=False)
+        first = True
+        try:
+            for index, future in enumerate(futures):
+                try:
+                    audio_file = future.result(timeout=timeout)[0]
+                    data = read_chunk_audio(audio_dir_path(audio_file), first)
+                except Exception as e:
+                    logger.error(f'长文本第 {index + 1} 句合成失败: {str(e)}')
+                    status['skipped'].append(index)
+                    continue
+                first = False
+                status['streamed'] += 1
+                yield data
+            status['done'] = True
+        finally:
+            # 客户端中途断开时取消尚未开始的分句
+            for future in futures:
+                future.cancel()
+
+    def status(self, job_id: str):
+        """
+        返回朗读任务的状态副本，未知的任务返回 None。
+        """
+        with self._jobs_lock:
+            status = self._jobs.get(job_id)
+            return None if status is None else {**status, 'skipped': list(status['skipped'])}
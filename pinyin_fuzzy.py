@@ -0,0 +1,215 @@
+import re
+
+# 只对纯字母输入做模糊匹配，汉字等其他输入原样交给 TTS
+PINYIN_PATTERN = re.compile(r'^[a-z]+$')
+
+# 普通话标准音节表（ü 写作 v）。词表中没有但属于合法音节的输入保持原有行为，不做纠错；
+# 近似匹配索引同时覆盖这些音节，拼写错误不会被纠正到词表中恰好收录的无关音节
+VALID_SYLLABLES = frozenset('''
+a ai an ang ao ba bai ban bang bao bei ben beng bi bian biao bie bin bing bo bu
+ca cai can cang cao ce cen ceng cha chai chan chang chao che chen cheng chi chong
+chou chu chua chuai chuan chuang chui chun chuo ci cong cou cu cuan cui cun cuo
+da dai dan dang dao de dei den deng di dia dian diao die ding diu dong dou du duan
+dui dun duo e ei en eng er fa fan fang fei fen feng fo fou fu ga gai gan gang gao
+ge gei gen geng gong gou gu gua guai guan guang gui gun guo ha hai han hang hao he
+hei hen heng hong hou hu hua huai huan huang hui hun huo ji jia jian jiang jiao jie
+jin jing jiong jiu ju juan jue jun ka kai kan kang kao ke kei ken keng kong kou ku
+kua kuai kuan kuang kui kun kuo la lai lan lang lao le lei leng li lia lian liang
+liao lie lin ling liu lo long lou lu lv luan lve lun luo ma mai man mang mao me mei
+men meng mi mian miao mie min ming miu mo mou mu na nai nan nang nao ne nei nen
+neng ni nian niang niao nie nin ning niu nong nou nu nv nuan nve nuo o ou pa pai
+pan pang pao pei pen peng pi pian piao pie pin ping po pou pu qi qia qian qiang
+qiao qie qin qing qiong qiu qu quan que qun ran rang rao re ren reng ri rong rou
+ru rua ruan rui run ruo sa sai san sang sao se sen seng sha shai shan shang shao
+she shei shen sheng shi shou shu shua shuai shuan shuang shui shun shuo si song
+sou su suan sui sun suo ta tai tan tang tao te teng ti tian tiao tie ting tong tou
+tu tuan tui tun tuo wa wai wan wang wei wen weng wo wu xi xia xian xiang xiao xie
+xin xing xiong xiu xu xuan xue xun ya yan yang yao ye yi yin ying yo yong you yu
+yuan yue yun za zai zan zang zao ze zei zen zeng zha zhai zhan zhang zhao zhe zhei
+zhen zheng zhi zhong zhou zhu zhua zhuai zhuan zhuang zhui zhun zhuo zi zong zou
+zu zuan zui zun zuo
+'''.split())
+
+
+# 最长的音节（如 zhuang、shuang）为 6 个字母
+MAX_SYLLABLE_LENGTH = max(len(syllable) for syllable in VALID_SYLLABLES)
+
+
+def split_syllables(word: str):
+    """
+    把连写的拼音（如 nihao、xuesheng）完整切分为合法音节。
+
+    动态规划求音节数最少的切分，无法完整切分时返回 None。
+
+    返回:
+        list | None: 音节列表。
+    """
+    if not word:
+        return None
+    # best[i] 为 word[:i] 音节数最少的切分
+    best = [[]] + [None] * len(word)
+    for end in range(1, len(word) + 1):
+        for start in range(max(0, end - MAX_SYLLABLE_LENGTH), end):
+            if best[start] is None or word[start:end] not in VALID_SYLLABLES:
+                continue
+            if best[end] is None or len(best[start]) + 1 < len(best[end]):
+                best[end] = best[start] + [word[start:end]]
+    return best[-1]
+
+
+def edit_distance(a: str, b: str) -> int:
+    """
+    计算两个字符串的编辑距离（含相邻字符交换，即 Damerau-Levenshtein 的 OSA 版本）。
+
+    相邻交换计为 1，这样 'shiu' 与 'shui' 的距离为 1。
+    """
+    if a == b:
+        return 0
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[len(b)]
+
+
+def _deletes(word: str, max_distance: int):
+    # 生成删除不超过 max_distance 个字符得到的所有变体（含原词）
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for w in frontier:
+            for i in range(len(w)):
+                next_frontier.add(w[:i] + w[i + 1:])
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+class PinyinIndex:
+    """
+    基于删除邻域（SymSpell 思路）的拼音近似匹配索引。
+
+    构建时为每个音节预先生成删除变体，查询时只需生成输入的删除变体并查表，
+    再用编辑距离校验候选，不需要遍历整个词表。
+    """
+
+    def __init__(self, keys, max_distance: int = 2):
+        self.max_distance = max_distance
+        self.keys = set(keys)
+        self._index = {}
+        for key in self.keys:
+            for variant in _deletes(key, max_distance):
+                self._index.setdefault(variant, []).append(key)
+        # 结果很少变化，缓存查询结果避免重复计算
+        self._cache = {}
+
+    def candidates(self, word: str, max_distance: int = None):
+        """
+        返回编辑距离不超过 max_distance 的候选音节，按相似度排序。
+
+        参数:
+            word (str): 输入的拼音。
+            max_distance (int): 最大编辑距离，默认使用构建时的值。
+
+        返回:
+            list: (音节, 距离) 元组列表。
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        if word in self.keys:
+            return [(word, 0)]
+
+        seen = set()
+        results = []
+        for variant in _deletes(word, max_distance):
+            for key in self._index.get(variant, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                distance = edit_distance(word, key)
+                if distance <= max_distance:
+                    results.append((key, distance))
+        # 距离相同时优先字母组成相同的音节（相邻交换），再优先长度一致的（替换错误），
+        # 最后按字母序保证稳定
+        letters = sorted(word)
+        results.sort(key=lambda item: (item[1], sorted(item[0]) != letters,
+                                       abs(len(item[0]) - len(word)), item[0]))
+        return results
+
+    def _limit(self, word: str):
+        # 编辑距离不能超过输入长度的一半，避免 'x' 之类的短输入匹配到任意音节
+        return min(self.max_distance, max(1, len(word) // 2))
+
+    def best_match(self, word: str):
+        """
+        返回最接近的音节；没有可接受的候选，或最接近的候选不止一个时返回 None。
+        """
+        if word in self._cache:
+            return self._cache[word]
+        match = None
+        # 从距离 1 开始逐级放宽，命中即停，绝大多数拼写错误只需生成一层删除变体
+        for distance in range(1, self._limit(word) + 1):
+            found = self.candidates(word, distance)
+            if found:
+                # 同距离下字母组成相同的候选（相邻交换，如 shiu -> shui）优先，
+                # 其余同样接近的候选（如 shuii 之于 shui / shuai）无法判断，不做猜测
+                ranks = [(d, sorted(key) != sorted(word)) for key, d in found]
+                best = min(ranks)
+                top = [key for (key, _), rank in zip(found, ranks) if rank == best]
+                match = top[0] if len(top) == 1 else None
+                break
+        if len(self._cache) < 10000:
+            self._cache[word] = match
+        return match
+
+    def suggestions(self, word: str, k: int = 5):
+        """
+        返回最多 k 个近似音节，供无法自动纠正时提示用户。
+        """
+        return [key for key, _ in self.candidates(word, self._limit(word))[:k]]
+
+
+def normalize_pinyin(pinyin: str) -> str:
+    """
+    规范化用户输入：去掉首尾空白、转小写，ü 写作 v。
+    """
+    return pinyin.strip().lower().replace('ü', 'v')
+
+
+def resolve_pinyin(pinyin: str, lexicon: dict, index: PinyinIndex):
+    """
+    将用户输入解析为音节。
+
+    参数:
+        pinyin (str): 用户输入。
+        lexicon (dict): 拼音到汉字的映射。
+        index (PinyinIndex): 近似匹配索引，应覆盖词表和全部合法音节。
+
+    返回:
+        tuple: (解析后的拼音, 合成文本)。词表收录的音节返回对应汉字；
+        汉字等非拼音输入，以及能完整切分为合法音节的输入（单个音节或 nihao 这样的
+        连写拼音）按规范化后的形式透传；
+        看起来像拼音但无法确定唯一的近似音节时返回 (None, None)。
+    """
+    if pinyin in lexicon:
+        return pinyin, lexicon[pinyin]
+    normalized = normalize_pinyin(pinyin)
+    if normalized in lexicon:
+        return normalized, lexicon[normalized]
+    if not PINYIN_PATTERN.match(normalized) or split_syllables(normalized) is not None:
+        # 汉字等非拼音输入、词表未收录的合法音节和多音节连写拼音直接合成，
+        # 只有无法切分的输入才当作拼写错误纠正；
+        # 使用规范化后的形式，Shui 和 shui 共用同一个缓存文件
+        return normalized, normalized
+    match = index.best_match(normalized)
+    if match is None:
+        return None, None
+    # 纠正到词表未收录的合法音节时同样透传
+    return match, lexicon.get(match, match)
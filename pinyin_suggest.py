@@ -0,0 +1,57 @@
+from bisect import bisect_left
+
+
+class PrefixIndex:
+    """
+    不可变的有序数组前缀索引，用于拼音输入联想。
+
+    所有拼音按字母序存成两个并列元组（拼音、汉字），前缀查询用二分查找定位区间，
+    不需要逐个扫描词表。短前缀（长度不超过 precompute_depth）对应的区间很大，
+    构建时预先算好前 k 个结果，查询时直接返回。
+    """
+
+    def __init__(self, lexicon: dict, k: int = 10, precompute_depth: int = 2):
+        items = sorted(lexicon.items())
+        self.k = k
+        self._keys = tuple(key for key, _ in items)
+        self._values = tuple(value for _, value in items)
+        # 排序规则：短的音节优先（更可能是用户想要的），再按字母序
+        self._rank = tuple((len(key), key) for key in self._keys)
+        self._top = {}
+        for key in self._keys:
+            for depth in range(0, min(precompute_depth, len(key)) + 1):
+                prefix = key[:depth]
+                if prefix not in self._top:
+                    self._top[prefix] = self._search(prefix, k)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _range(self, prefix: str):
+        lo = bisect_left(self._keys, prefix)
+        # '￿' 大于任何拼音字符，得到前缀区间的右边界
+        hi = bisect_left(self._keys, prefix + '￿', lo)
+        return lo, hi
+
+    def _search(self, prefix: str, k: int):
+        lo, hi = self._range(prefix)
+        positions = sorted(range(lo, hi), key=self._rank.__getitem__)[:k]
+        return tuple((self._keys[i], self._values[i]) for i in positions)
+
+    def suggest(self, prefix: str, k: int = None):
+        """
+        返回以 prefix 开头的前 k 个 (拼音, 汉字)。
+
+        参数:
+            prefix (str): 输入前缀。
+            k (int): 返回数量，默认为构建时的 k。
+
+        返回:
+            tuple: (拼音, 汉字) 元组。
+        """
+        k = self.k if k is None else k
+        prefix = prefix.strip().lower()
+        cached = self._top.get(prefix)
+        if cached is not None and k <= self.k:
+            return cached[:k]
+        return self._search(prefix, k)
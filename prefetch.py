@@ -0,0 +1,237 @@
+import os
+import re
+import ast
+import asyncio
+import threading
+import contextvars
+import logging
+from collections import Counter, OrderedDict
+
+from failure_cache import FailureCache, RetryBudget, SynthesisBackoff
+
+logger = logging.getLogger(__name__)
+
+# 与 hanzipinyin.py 相同的行格式: 汉字 拼音 音序 部首 ...
+_CHAR_PINYIN_PATTERN = re.compile(r'^(\S+)\s+([a-zA-Züǖǘǚǜēéěèāáǎàōóǒòīíǐìūúǔù]+)\s+[A-Z]')
+_TONE_MAP = str.maketrans('āáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜü', 'aaaaeeeeiiiioooouuuuvvvvv')
+
+
+def lesson_sequence(path: str = 'hanzipinyin.py'):
+    """
+    按课文顺序返回 ocr_data_page* 表格中的拼音（去声调）。
+
+    hanzipinyin.py 在导入时就会解析并打印全部数据，这里只用 ast 读取其中的
+    字符串常量，不执行该模块。
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError):
+        return []
+    pages = []
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)
+                and node.targets[0].id.startswith('ocr_data_page')
+                and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)):
+            pages.append((int(node.targets[0].id[len('ocr_data_page'):] or 0), node.value.value))
+
+    sequence = []
+    for _, text in sorted(pages):
+        for line in text.strip().split('\n'):
+            match = _CHAR_PINYIN_PATTERN.match(line.strip())
+            if match and len(match.group(1)) == 1 and '一' <= match.group(1) <= '鿿':
+                pinyin = re.sub(r'[^a-zA-Z]', '', match.group(2).translate(_TONE_MAP)).lower()
+                if pinyin:
+                    sequence.append(pinyin)
+    return sequence
+
+
+class TransitionModel:
+    """
+    有界的访问频次和转移计数（一阶马尔可夫链）。
+
+    记录每个 key 的访问次数以及 "上一个 key -> 下一个 key" 的次数。
+    条目数超过上限时所有计数减半并删除归零的条目（指数衰减），
+    既限制内存，也让近期的访问模式占更大权重。
+    课文顺序作为先验：相邻两课的字各记 prior_weight 次转移，没有访问记录时也能预测。
+    """
+
+    def __init__(self, max_keys: int = 5000, max_edges: int = 8, prior_weight: int = 1):
+        self.max_keys = max_keys
+        self.max_edges = max_edges
+        self.prior_weight = prior_weight
+        self._frequency = Counter()
+        self._transitions = {}
+        self._lock = threading.Lock()
+
+    def seed(self, sequence):
+        """
+        用课文顺序初始化转移计数。
+        """
+        with self._lock:
+            for prev, nxt in zip(sequence, sequence[1:]):
+                if prev != nxt:
+                    self._add_edge(prev, nxt, self.prior_weight)
+
+    def _add_edge(self, prev, nxt, weight):
+        edges = self._transitions.get(prev)
+        if edges is None:
+            edges = self._transitions[prev] = Counter()
+        edges[nxt] += weight
+        # 每个 key 只保留计数最高的 max_edges 条转移
+        if len(edges) > self.max_edges:
+            del edges[min(edges, key=edges.__getitem__)]
+
+    def record(self, prev, key):
+        with self._lock:
+            self._frequency[key] += 1
+            if prev is not None and prev != key:
+                self._add_edge(prev, key, 1)
+            if len(self._frequency) > self.max_keys or len(self._transitions) > self.max_keys:
+                self._decay()
+
+    def _decay(self):
+        self._frequency = Counter({k: v // 2 for k, v in self._frequency.items() if v > 1})
+        for prev in list(self._transitions):
+            edges = Counter({k: v // 2 for k, v in self._transitions[prev].items() if v > 1})
+            if edges:
+                self._transitions[prev] = edges
+            else:
+                del self._transitions[prev]
+
+    def predict(self, key, k: int = 3):
+        """
+        返回 key 之后最可能被请求的 k 个 key，转移计数相同时按全局频次排序。
+        """
+        with self._lock:
+            edges = self._transitions.get(key)
+            if not edges:
+                return []
+            ranked = sorted(edges, key=lambda n: (-edges[n], -self._frequency[n], n))
+        return ranked[:k]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'keys': len(self._frequency),
+                'sources': len(self._transitions),
+                'edges': sum(len(edges) for edges in self._transitions.values()),
+                'top': self._frequency.most_common(10),
+            }
+
+
+class Prefetcher:
+    """
+    根据 TransitionModel 的预测在后台预先合成音频。
+
+    observe() 在请求线程中调用，只更新计数并把预测结果放入队列；
+    合成在独立线程的事件循环中执行。每个引擎有一个 RetryBudget（令牌桶）
+    限制每分钟的预取合成次数，预算用完的预测直接丢弃，不影响正常请求。
+    预取失败记录在预取器自己的 FailureCache 中，与用户请求的失败记录和重试预算分开。
+    """
+
+    def __init__(self, model: TransitionModel, synthesize, is_cached, resolve,
+                 depth: int = 3, per_minute: float = 30, max_pending: int = 100,
+                 max_sessions: int = 10000):
+        self.model = model
+        self.synthesize = synthesize
+        self.is_cached = is_cached
+        self.resolve = resolve
+        self.depth = depth
+        self.per_minute = per_minute
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        # 每个客户端上一次请求的 key，用于记录转移
+        self._last = OrderedDict()
+        self._budgets = {}
+        self._failures = FailureCache()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._counts = Counter()
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='prefetch', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def observe(self, session: str, key: str, engine: str):
+        """
+        记录一次请求并调度预取。
+        """
+        with self._lock:
+            prev = self._last.pop(session, None)
+            self._last[session] = key
+            if len(self._last) > self.max_sessions:
+                self._last.popitem(last=False)
+        self.model.record(prev, key)
+        if self.depth <= 0 or self.per_minute <= 0:
+            return
+
+        for candidate in self.model.predict(key, self.depth):
+            resolved = self.resolve(candidate)
+            if resolved is None:
+                continue
+            pinyin, hanzi = resolved
+            job = (engine, pinyin)
+            with self._lock:
+                if job in self._pending or len(self._pending) >= self.max_pending:
+                    continue
+                if self.is_cached(pinyin, engine):
+                    self._counts['hit'] += 1
+                    continue
+                try:
+                    self._failures.check(engine, pinyin)
+                except SynthesisBackoff:
+                    self._counts['backoff'] += 1
+                    continue
+                budget = self._budgets.get(engine)
+                if budget is None:
+                    budget = self._budgets[engine] = RetryBudget(self.per_minute / 60, self.per_minute)
+                if budget.try_acquire():
+                    self._counts['over_budget'] += 1
+                    continue
+                self._pending.add(job)
+            # 在空的上下文中调度：否则后台任务继承当前请求的 contextvars，
+            # 预取的 span 会被记入发起请求的追踪
+            contextvars.Context().run(asyncio.run_coroutine_threadsafe, self._run(job, hanzi),
+                                      self._ensure_loop())
+
+    async def _run(self, job, hanzi):
+        engine, pinyin = job
+        result = 'synthesized'
+        try:
+            await self.synthesize(pinyin, hanzi, engine)
+            self._failures.record_success(engine, pinyin)
+        except Exception as e:
+            result = 'failed'
+            self._failures.record_failure(engine, pinyin, str(e))
+            logger.debug(f'预取失败: {pinyin}: {str(e)}', extra={'model': engine})
+        finally:
+            with self._lock:
+                self._pending.discard(job)
+                self._counts[result] += 1
+
+    def stats(self):
+        with self._lock:
+            result = {'pending': len(self._pending), 'sessions': len(self._last), **self._counts}
+        result['model'] = self.model.stats()
+        result['failures'] = self._failures.stats()
+        return result
+
+
+def prefetcher_from_env(synthesize, is_cached, resolve):
+    """
+    按环境变量创建预取器：PREFETCH_DEPTH（每次预测数量，0 关闭）、
+    PREFETCH_PER_MINUTE（每个引擎每分钟最多预取合成次数）。
+    """
+    model = TransitionModel()
+    model.seed(lesson_sequence())
+    return Prefetcher(model, synthesize, is_cached, resolve,
+                      depth=int(os.environ.get('PREFETCH_DEPTH', '3')),
+                      per_minute=float(os.environ.get('PREFETCH_PER_MINUTE', '30')))
@@ -0,0 +1,66 @@
+import os
+import gzip
+import shutil
+
+import pytest
+
+from audio_sprite import build_sprite, load_manifest, remove_sprites_containing, sprite_paths
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'audio')
+
+
+@pytest.fixture
+def clips(tmp_path):
+    audio_dir = tmp_path / 'audio'
+    audio_dir.mkdir()
+    shutil.copy(os.path.join(AUDIO_DIR, 'a.mp3'), audio_dir / 'a.mp3')
+    (audio_dir / 'b.mp3').write_bytes(b'\xff\xfb' + b'\x00' * 30)
+    (audio_dir / 'empty.mp3').write_bytes(b'')
+    return [
+        ('a', '啊', str(audio_dir / 'a.mp3')),
+        ('b', '不', str(audio_dir / 'b.mp3')),
+        ('a', '啊', str(audio_dir / 'a.mp3')),
+        ('empty', '空', str(audio_dir / 'empty.mp3')),
+        ('gone', '无', str(audio_dir / 'gone.mp3')),
+    ]
+
+
+def test_build_sprite_offsets_match_data(tmp_path, clips):
+    sprite_dir = str(tmp_path / 'sprites')
+    manifest = build_sprite('lesson', 'gtts', clips, sprite_dir)
+    data_path, _ = sprite_paths('lesson', 'gtts', sprite_dir)
+    with open(data_path, 'rb') as f:
+        data = f.read()
+
+    assert list(manifest['clips']) == ['a', 'b']
+    assert manifest['missing'] == ['empty', 'gone']
+    assert manifest['size'] == len(data)
+    for pinyin, audio_path in (('a', clips[0][2]), ('b', clips[1][2])):
+        clip = manifest['clips'][pinyin]
+        with open(audio_path, 'rb') as f:
+            assert data[clip['offset']:clip['offset'] + clip['length']] == f.read()
+    assert manifest['clips']['a']['duration'] == pytest.approx(0.672)
+
+    with gzip.open(f'{data_path}.gz', 'rb') as gz:
+        assert gz.read() == data
+    assert load_manifest('lesson', 'gtts', sprite_dir) == manifest
+    assert not [name for name in os.listdir(sprite_dir) if name.endswith('.tmp')]
+
+
+def test_version_changes_with_content(tmp_path, clips):
+    sprite_dir = str(tmp_path / 'sprites')
+    first = build_sprite('lesson', 'gtts', clips[:1], sprite_dir)
+    assert build_sprite('lesson', 'gtts', clips[:1], sprite_dir)['version'] == first['version']
+    assert build_sprite('lesson', 'gtts', clips[:2], sprite_dir)['version'] != first['version']
+
+
+def test_remove_sprites_containing(tmp_path, clips):
+    sprite_dir = str(tmp_path / 'sprites')
+    build_sprite('one', 'gtts', clips[:1], sprite_dir)
+    build_sprite('two', 'gtts', clips[1:2], sprite_dir)
+
+    removed = remove_sprites_containing(['a'], sprite_dir)
+    assert removed == [sprite_paths('one', 'gtts', sprite_dir)[1]]
+    assert sorted(os.listdir(sprite_dir)) == ['two_gtts.bin', 'two_gtts.bin.gz', 'two_gtts.json']
+    assert load_manifest('one', 'gtts', sprite_dir) is None
+    assert remove_sprites_containing(['a'], str(tmp_path / 'missing')) == []
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from audio_utils import _mp3_duration, audio_format, probe_duration, strip_id3
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'audio')
+
+
+def test_audio_format_from_extension():
+    assert audio_format('static/audio/chun.MP3') == 'mp3'
+    assert audio_format('chun.wav') == 'wav'
+
+
+def test_mp3_duration_from_frame_headers():
+    assert probe_duration(os.path.join(AUDIO_DIR, 'a.mp3')) == pytest.approx(0.672)
+
+
+def test_mp3_duration_rejects_non_audio():
+    assert _mp3_duration(b'') is None
+    assert _mp3_duration(b'not an mp3 file at all') is None
+
+
+def test_strip_id3_skips_tag():
+    # ID3v2 头: 'ID3' + 版本 + 标志 + 4 字节 synchsafe 长度（此处为 4）
+    tag = b'ID3\x04\x00\x00\x00\x00\x00\x04' + b'TAGS'
+    assert strip_id3(tag + b'\xff\xfb') == b'\xff\xfb'
+    assert strip_id3(b'\xff\xfb') == b'\xff\xfb'
@@ -0,0 +1,45 @@
+import pytest
+
+from audio_variants import (VariantUnavailable, parse_variant, parse_variant_file, render_variant,
+                            variant_file_for, variants_available)
+
+
+@pytest.mark.parametrize('speed, pitch, expected', [
+    (None, None, None),
+    ('1', '0', None),
+    ('0.75', None, (0.75, 0)),
+    ('1', '2.6', (1.0, 3)),
+    ('0.5', '-12', (0.5, -12)),
+])
+def test_parse_variant(speed, pitch, expected):
+    assert parse_variant(speed, pitch) == expected
+
+
+@pytest.mark.parametrize('speed, pitch', [
+    ('3', None), ('0.1', None), ('1', '13'), ('abc', None), ('1', 'inf'), ('1', '1e400'), ('nan', None),
+])
+def test_parse_variant_rejects_invalid(speed, pitch):
+    with pytest.raises(ValueError):
+        parse_variant(speed, pitch)
+
+
+@pytest.mark.parametrize('audio_file, speed, pitch', [
+    ('chun.mp3', 0.75, 0),
+    ('chun.wav', 1.0, 2),
+    ('chunk-0123456789abcdef.mp3', 0.5, -3),
+])
+def test_variant_file_round_trip(audio_file, speed, pitch):
+    filename = variant_file_for(audio_file, speed, pitch)
+    assert parse_variant_file(filename) == (audio_file, speed, pitch)
+
+
+def test_parse_variant_file_ignores_plain_files():
+    assert parse_variant_file('chun.mp3') is None
+    assert parse_variant_file('chun.wav') is None
+    assert parse_variant_file('chun.mp3@fastx.wav') is None
+
+
+@pytest.mark.skipif(variants_available(), reason='已安装 librosa')
+def test_render_variant_without_librosa(tmp_path):
+    with pytest.raises(VariantUnavailable):
+        render_variant('missing.mp3', str(tmp_path / 'out.wav'), 0.75, 0)
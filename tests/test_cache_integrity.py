@@ -0,0 +1,112 @@
+import os
+import shutil
+
+import pytest
+
+from cache_integrity import CacheIndex, CacheScrubber, file_lock, temp_path_for, validate_clip
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'audio')
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    audio_dir = tmp_path / 'audio'
+    audio_dir.mkdir()
+    for name in ('a.mp3', 'b.mp3'):
+        shutil.copy(os.path.join(AUDIO_DIR, 'a.mp3'), audio_dir / name)
+    return str(audio_dir), str(tmp_path / 'state')
+
+
+def test_validate_clip(dirs):
+    audio_dir, _ = dirs
+    assert validate_clip(os.path.join(audio_dir, 'a.mp3')) == (pytest.approx(0.672), None)
+    empty = os.path.join(audio_dir, 'empty.mp3')
+    open(empty, 'wb').close()
+    assert validate_clip(empty) == (None, '空文件')
+    assert validate_clip(os.path.join(audio_dir, 'missing.mp3'))[1].startswith('无法读取')
+    tmp = temp_path_for(os.path.join(audio_dir, 'a.mp3'))
+    assert os.path.dirname(tmp) == audio_dir and os.path.basename(tmp).startswith('.')
+    assert tmp.endswith('-a.mp3')
+
+
+def test_flush_merges_entries_from_other_processes(dirs):
+    audio_dir, state_dir = dirs
+    # 两个 CacheIndex 实例模拟两个 worker 进程共用同一个索引文件
+    first = CacheIndex(audio_dir, state_dir)
+    second = CacheIndex(audio_dir, state_dir)
+    first.record('a.mp3', 'gtts', text='啊')
+    second.record('b.mp3', 'edgetts')
+    first.flush()
+    second.flush()
+
+    assert sorted(CacheIndex(audio_dir, state_dir).filenames()) == ['a.mp3', 'b.mp3']
+    # flush 之后内存中的索引也包含其他进程的条目
+    assert second.get('a.mp3')['text'] == '啊'
+
+    second.discard('a.mp3')
+    second.flush()
+    first.flush()
+    assert CacheIndex(audio_dir, state_dir).filenames() == ['b.mp3']
+    assert first.get('a.mp3') is None
+
+
+def test_index_lives_outside_audio_dir(dirs):
+    audio_dir, state_dir = dirs
+    with open(os.path.join(audio_dir, '.index.json'), 'w', encoding='utf-8') as f:
+        f.write('{"a.mp3": {"sha256": "x", "size": 1, "engine": "gtts"}}')
+    index = CacheIndex(audio_dir, state_dir)
+    assert index.get('a.mp3')['engine'] == 'gtts'
+    assert not os.path.exists(os.path.join(audio_dir, '.index.json'))
+    index.record('b.mp3', 'gtts')
+    index.flush()
+    assert sorted(os.listdir(audio_dir)) == ['a.mp3', 'b.mp3']
+
+
+def test_scan_quarantines_and_repairs(dirs):
+    audio_dir, state_dir = dirs
+    index = CacheIndex(audio_dir, state_dir)
+    index.record('a.mp3', 'gtts', text='啊')
+    with open(os.path.join(audio_dir, 'a.mp3'), 'ab') as f:
+        f.write(b'garbage')
+    open(os.path.join(audio_dir, 'empty.mp3'), 'wb').close()
+
+    repaired = []
+    scrubber = CacheScrubber(audio_dir, index, lambda name, entry: repaired.append((name, entry)),
+                             bytes_per_sec=0, pause=0)
+    report = scrubber.scan()
+
+    assert report['checked'] == 3
+    assert report['quarantined'] == ['a.mp3', 'empty.mp3']
+    assert report['repaired'] == 2
+    assert repaired[0][0] == 'a.mp3' and repaired[0][1]['text'] == '啊'
+    assert repaired[1] == ('empty.mp3', None)
+    assert os.listdir(audio_dir) == ['b.mp3']
+    quarantined = os.listdir(os.path.join(state_dir, 'quarantine'))
+    assert sorted(name.split('-', 1)[1] for name in quarantined) == ['a.mp3', 'empty.mp3']
+    # 未登记的正常文件被补登记，损坏文件的条目被移除
+    assert CacheIndex(audio_dir, state_dir).filenames() == ['b.mp3']
+
+
+def test_mismatch_rechecked_against_merged_index(dirs):
+    audio_dir, state_dir = dirs
+    stale = CacheIndex(audio_dir, state_dir)
+    stale.record('a.mp3', 'gtts')
+    stale.flush()
+    # 另一个进程重新合成了 a.mp3 并登记了新的校验和
+    other = CacheIndex(audio_dir, state_dir)
+    with open(os.path.join(audio_dir, 'a.mp3'), 'ab') as f:
+        f.write(b'\x00' * 16)
+    other.record('a.mp3', 'gtts')
+    other.flush()
+
+    report = CacheScrubber(audio_dir, stale, bytes_per_sec=0, pause=0).scan()
+    assert report['quarantined'] == []
+
+
+def test_only_one_process_scans(dirs):
+    audio_dir, state_dir = dirs
+    scrubber = CacheScrubber(audio_dir, CacheIndex(audio_dir, state_dir), bytes_per_sec=0, pause=0)
+    with file_lock(scrubber.lock_path) as acquired:
+        assert acquired
+        assert 'skipped' in scrubber.scan()
+    assert scrubber.scan()['checked'] == 2
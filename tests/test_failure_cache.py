@@ -0,0 +1,101 @@
+import pytest
+
+import failure_cache
+from failure_cache import FailureCache, RetryBudget, SynthesisBackoff
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(failure_cache.time, 'monotonic', fake)
+    return fake
+
+
+def test_retry_budget_refills_at_rate():
+    budget = RetryBudget(rate=1.0, capacity=2)
+    assert budget.try_acquire(now=budget._updated) == 0
+    assert budget.try_acquire(now=budget._updated) == 0
+    assert budget.try_acquire(now=budget._updated) == pytest.approx(1.0)
+    assert budget.try_acquire(now=budget._updated + 1.0) == 0
+
+
+def test_failure_blocks_key_until_ttl(clock):
+    cache = FailureCache(base_ttl=5, max_ttl=300)
+    cache.check('gtts', 'a.mp3')
+    assert cache.record_failure('gtts', 'a.mp3', 'boom') == 5
+
+    with pytest.raises(SynthesisBackoff) as info:
+        cache.check('gtts', 'a.mp3')
+    assert info.value.short_circuited
+    assert info.value.retry_after == 5
+    assert info.value.last_error == 'boom'
+
+    clock.now += 5
+    cache.check('gtts', 'a.mp3')
+
+
+def test_ttl_doubles_and_is_capped(clock):
+    cache = FailureCache(base_ttl=5, max_ttl=30)
+    ttls = [cache.record_failure('gtts', 'a.mp3', 'boom') for _ in range(5)]
+    assert ttls == [5, 10, 20, 30, 30]
+
+
+def test_success_resets_key_and_engine(clock):
+    cache = FailureCache(base_ttl=5)
+    cache.record_failure('gtts', 'a.mp3', 'boom')
+    cache.record_failure('gtts', 'a.mp3', 'boom')
+    cache.record_success('gtts', 'a.mp3')
+    assert not cache.is_failing('gtts', 'a.mp3')
+    assert cache.record_failure('gtts', 'a.mp3', 'boom') == 5
+
+
+def test_budget_limits_retries_while_engine_failing(clock):
+    cache = FailureCache(retry_rate=1, retry_capacity=2)
+    cache.record_failure('gtts', 'a.mp3', 'boom')
+
+    # 引擎处于失败状态时，其他 key 的合成也算作重试
+    cache.check('gtts', 'b.mp3')
+    cache.check('gtts', 'c.mp3')
+    with pytest.raises(SynthesisBackoff) as info:
+        cache.check('gtts', 'd.mp3')
+    assert info.value.short_circuited
+    assert info.value.retry_after == pytest.approx(1.0)
+
+    # 其他引擎不受影响
+    cache.check('edgetts', 'd.mp3')
+
+    clock.now += 1
+    cache.check('gtts', 'd.mp3')
+
+
+def test_is_failing_does_not_consume_budget(clock):
+    cache = FailureCache(retry_rate=1, retry_capacity=1)
+    cache.record_failure('gtts', 'a.mp3', 'boom')
+    for _ in range(5):
+        assert cache.is_failing('gtts')
+    cache.check('gtts', 'b.mp3')
+
+
+def test_forget_removes_key_for_all_engines(clock):
+    cache = FailureCache()
+    cache.record_failure('gtts', 'a.mp3', 'boom')
+    cache.record_failure('edgetts', 'a.mp3', 'boom')
+    cache.record_failure('gtts', 'b.mp3', 'boom')
+    assert cache.forget(['a.mp3']) == 2
+    assert cache.stats()['entries'] == 1
+
+
+def test_max_entries_evicts_oldest(clock):
+    cache = FailureCache(max_entries=2)
+    for key in ('a.mp3', 'b.mp3', 'c.mp3'):
+        cache.record_failure('gtts', key, 'boom')
+    assert cache.stats()['entries'] == 2
+    assert not cache.is_failing('edgetts', 'a.mp3')
@@ -0,0 +1,50 @@
+import json
+import os
+
+from lexicon import Lexicon, diff_keys
+
+
+def write_lexicon(path, version, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'entries': entries}, f, ensure_ascii=False)
+
+
+def test_diff_keys_includes_added_removed_and_changed():
+    old = {'chun': '春', 'hao': '好', 'shou': '首'}
+    new = {'chun': '春', 'hao': '号', 'shui': '水'}
+    assert diff_keys(old, new) == ['hao', 'shou', 'shui']
+
+
+def test_reload_swaps_snapshot_and_reports_changed_keys(tmp_path):
+    path = str(tmp_path / 'lexicon.json')
+    write_lexicon(path, 1, {'chun': '春', 'hao': '好'})
+    changes = []
+    lexicon = Lexicon(path, on_change=changes.append)
+    old = lexicon.current()
+    assert old.version == 1 and old.mapping == {'chun': '春', 'hao': '好'}
+
+    assert lexicon.reload() is None
+    write_lexicon(path, 2, {'chun': '春', 'hao': '号', 'shui': '水'})
+    result = lexicon.reload(force=True)
+
+    assert result == {'version': 2, 'entries': 3, 'invalidated': ['hao', 'shui']}
+    assert changes == [['hao', 'shui']]
+    assert lexicon.current().suggest_index.suggest('shu') == (('shui', '水'),)
+    # 旧快照保持不变，进行中的请求不受影响
+    assert old.mapping == {'chun': '春', 'hao': '好'}
+
+
+def test_invalid_file_keeps_current_version(tmp_path):
+    path = str(tmp_path / 'lexicon.json')
+    write_lexicon(path, 1, {'chun': '春'})
+    lexicon = Lexicon(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"version": 2, "entries": ["broken"]}')
+    assert lexicon.reload(force=True) is None
+    assert lexicon.current().version == 1
+
+
+def test_missing_file_uses_fallback(tmp_path):
+    lexicon = Lexicon(os.path.join(str(tmp_path), 'missing.json'), fallback={'chun': '春'})
+    assert lexicon.current().source == 'pinyin_map'
+    assert lexicon.current().mapping == {'chun': '春'}
@@ -0,0 +1,53 @@
+import os
+import concurrent.futures
+
+from long_text import LongTextSynthesizer, chunk_key, split_text
+from tracing import finish_trace, span, start_trace
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'audio')
+
+
+def test_split_text_by_punctuation():
+    text = '床前明月光，疑是地上霜。举头望明月，低头思故乡。'
+    assert split_text(text) == ['床前明月光', '疑是地上霜', '举头望明月', '低头思故乡']
+
+
+def test_split_text_merges_short_and_truncates_long():
+    assert split_text('啊，好。') == ['啊好']
+    chunks = split_text('一' * 120, max_chars=50)
+    assert [len(chunk) for chunk in chunks] == [50, 50, 20]
+    assert split_text('。，！') == []
+
+
+def test_stream_reports_skipped_chunks():
+    def done(value=None, error=None):
+        future = concurrent.futures.Future()
+        future.set_exception(error) if error else future.set_result(value)
+        return future
+
+    synthesizer = LongTextSynthesizer(None)
+    futures = [done(('a.mp3', None)), done(error=RuntimeError('boom')), done(('a.mp3', None))]
+    data = list(synthesizer.stream(futures, lambda name: os.path.join(AUDIO_DIR, name), job_id='job'))
+    assert len(data) == 2
+    assert synthesizer.status('job') == {'chunks': 3, 'streamed': 2, 'skipped': [1], 'done': True}
+    assert synthesizer.status('missing') is None
+
+
+def test_submit_runs_chunks_outside_request_trace():
+    calls = []
+
+    async def synthesize(key, chunk, engine):
+        with span('synthesize'):
+            pass
+        calls.append((key, chunk, engine))
+        return f'{key}.mp3', None
+
+    synthesizer = LongTextSynthesizer(synthesize, concurrency=2)
+    trace, token = start_trace('long_audio')
+    futures = synthesizer.submit(['床前明月光', '疑是地上霜'], 'gtts')
+    results = [future.result(timeout=2) for future in futures]
+    finish_trace(trace, token)
+
+    assert results == [(f'{chunk_key(chunk)}.mp3', None) for chunk in ('床前明月光', '疑是地上霜')]
+    assert sorted(chunk for _, chunk, _ in calls) == ['床前明月光', '疑是地上霜']
+    assert trace.spans == []
@@ -0,0 +1,80 @@
+import pytest
+
+from lexicon import LexiconSnapshot
+from pinyin_fuzzy import (PinyinIndex, VALID_SYLLABLES, edit_distance, resolve_pinyin,
+                          split_syllables)
+
+LEXICON = {'chun': '春', 'shou': '首', 'chang': '唱', 'chui': '吹', 'chan': '产', 'hao': '好'}
+
+
+@pytest.fixture(scope='module')
+def index():
+    return PinyinIndex(set(LEXICON) | VALID_SYLLABLES)
+
+
+def resolve(word, index):
+    return resolve_pinyin(word, LEXICON, index)
+
+
+def test_edit_distance_counts_transposition_as_one():
+    assert edit_distance('shiu', 'shui') == 1
+    assert edit_distance('chun', 'chun') == 0
+    assert edit_distance('zhang', 'chang') == 1
+    assert edit_distance('abc', '') == 3
+
+
+def test_index_candidates_sorted_by_distance():
+    index = PinyinIndex(['shui', 'shou', 'shi'])
+    candidates = index.candidates('shiu', 1)
+    assert candidates[0] == ('shui', 1)
+    assert {key for key, _ in candidates} == {'shui', 'shou', 'shi'}
+
+
+@pytest.mark.parametrize('word, expected', [
+    ('nihao', ['ni', 'hao']),
+    ('mama', ['ma', 'ma']),
+    ('xuesheng', ['xue', 'sheng']),
+    ('zhongguo', ['zhong', 'guo']),
+    ('shui', ['shui']),
+    ('shiu', None),
+    ('zhnag', None),
+    ('', None),
+])
+def test_split_syllables(word, expected):
+    assert split_syllables(word) == expected
+
+
+@pytest.mark.parametrize('typo, expected', [
+    ('shiu', 'shui'),
+    ('zhnag', 'zhang'),
+    ('chaun', 'chuan'),
+    ('hoa', 'hao'),
+])
+def test_resolve_corrects_to_valid_syllable(index, typo, expected):
+    assert resolve(typo, index) == (expected, LEXICON.get(expected, expected))
+
+
+@pytest.mark.parametrize('word', ['nihao', 'mama', 'dami', 'laoshi', 'xuesheng'])
+def test_resolve_passes_through_multi_syllable_pinyin(index, word):
+    assert resolve(word, index) == (word, word)
+
+
+def test_resolve_refuses_to_guess_between_ties(index):
+    assert resolve('shuii', index) == (None, None)
+    suggestions = index.suggestions('shuii')
+    assert 'shui' in suggestions and 'shuai' in suggestions
+
+
+def test_resolve_passes_through_normalized_input(index):
+    assert resolve('Shui', index) == ('shui', 'shui')
+    assert resolve(' CHUN ', index) == ('chun', '春')
+    assert resolve('水', index) == ('水', '水')
+    assert resolve('lü', index) == ('lv', 'lv')
+
+
+def test_resolve_rejects_unrelated_input(index):
+    assert resolve('qqqqqq', index) == (None, None)
+
+
+def test_snapshot_fuzzy_index_covers_valid_syllables():
+    assert VALID_SYLLABLES <= LexiconSnapshot(1, LEXICON, 'test').fuzzy_index.keys
@@ -0,0 +1,18 @@
+from pinyin_suggest import PrefixIndex
+
+LEXICON = {'chun': '春', 'shou': '首', 'chang': '唱', 'chui': '吹', 'chan': '产', 'hao': '好'}
+
+
+def test_prefix_index_orders_shorter_first():
+    index = PrefixIndex(LEXICON, k=3)
+    assert index.suggest('ch') == (('chan', '产'), ('chui', '吹'), ('chun', '春'))
+    assert index.suggest('CHA', 5) == (('chan', '产'), ('chang', '唱'))
+    assert index.suggest('x') == ()
+    assert len(index.suggest('', 10)) == len(LEXICON)
+
+
+def test_precomputed_and_searched_prefixes_agree():
+    index = PrefixIndex(LEXICON, k=2, precompute_depth=1)
+    # 'c' 已预先计算，'ch' 需要二分查找，超过 k 时也走查找
+    assert index.suggest('c') == index.suggest('ch') == (('chan', '产'), ('chui', '吹'))
+    assert len(index.suggest('c', 4)) == 4
@@ -0,0 +1,114 @@
+import time
+
+from prefetch import Prefetcher, TransitionModel
+from tracing import finish_trace, span, start_trace
+
+
+def wait_idle(prefetcher, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while prefetcher.stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_transition_model_predicts_by_count():
+    model = TransitionModel()
+    model.seed(['a', 'b', 'a', 'c'])
+    for _ in range(3):
+        model.record('a', 'c')
+    assert model.predict('a', 2) == ['c', 'b']
+    assert model.predict('unknown') == []
+
+
+def test_transition_model_keeps_top_edges():
+    model = TransitionModel(max_edges=2)
+    for key, count in (('b', 3), ('c', 2), ('d', 1)):
+        for _ in range(count):
+            model.record('a', key)
+    assert model.predict('a', 10) == ['b', 'c']
+
+
+def test_transition_model_decays_when_full():
+    model = TransitionModel(max_keys=3)
+    for _ in range(4):
+        model.record('a', 'b')
+    for key in ('c', 'd', 'e'):
+        model.record(None, key)
+    # 第 4 个 key 触发衰减：计数减半，只出现过一次的 key 和转移被删除
+    stats = model.stats()
+    assert dict(stats['top']) == {'b': 2}
+    assert model.predict('a') == ['b']
+
+
+class FakeSynthesis:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def __call__(self, pinyin, hanzi, engine):
+        with span('synthesize'):
+            pass
+        self.calls.append((pinyin, engine))
+        if self.fail:
+            raise RuntimeError('upstream down')
+
+
+def make_prefetcher(synthesize, cached=(), **kwargs):
+    model = TransitionModel()
+    model.seed(['a', 'b', 'c', 'a', 'd'])
+    return Prefetcher(model, synthesize, lambda pinyin, engine: pinyin in cached,
+                      lambda key: (key, key.upper()), **kwargs)
+
+
+def test_prefetch_skips_cached_and_respects_budget():
+    synthesize = FakeSynthesis()
+    prefetcher = make_prefetcher(synthesize, cached={'b'}, depth=3, per_minute=1)
+    prefetcher.observe('tablet-1', 'a', 'gtts')
+    wait_idle(prefetcher)
+
+    stats = prefetcher.stats()
+    assert stats['hit'] == 1
+    assert stats['synthesized'] == 1 and 'over_budget' not in stats
+    assert synthesize.calls == [('d', 'gtts')]
+
+    # 预算（每分钟 1 次）已用完，其他引擎有独立的预算
+    prefetcher.observe('tablet-1', 'c', 'gtts')
+    prefetcher.observe('tablet-1', 'c', 'edgetts')
+    wait_idle(prefetcher)
+    assert prefetcher.stats()['over_budget'] == 1
+    assert synthesize.calls[-1] == ('a', 'edgetts')
+
+
+def test_prefetch_failures_back_off_locally():
+    synthesize = FakeSynthesis(fail=True)
+    prefetcher = make_prefetcher(synthesize, depth=1)
+    prefetcher.observe('tablet-1', 'b', 'gtts')
+    wait_idle(prefetcher)
+    prefetcher.observe('tablet-2', 'b', 'gtts')
+    wait_idle(prefetcher)
+
+    stats = prefetcher.stats()
+    assert stats['failed'] == 1 and stats['backoff'] == 1
+    assert stats['failures']['failing_engines'] == ['gtts']
+    assert len(synthesize.calls) == 1
+
+
+def test_prefetch_spans_do_not_join_request_trace():
+    synthesize = FakeSynthesis()
+    prefetcher = make_prefetcher(synthesize, depth=1)
+    trace, token = start_trace('get_audio')
+    prefetcher.observe('tablet-1', 'b', 'gtts')
+    wait_idle(prefetcher)
+    finish_trace(trace, token)
+    assert synthesize.calls
+    assert trace.spans == []
+
+
+def test_sessions_tracked_separately():
+    prefetcher = make_prefetcher(FakeSynthesis(), depth=0)
+    prefetcher.observe('tablet-1', 'a', 'gtts')
+    prefetcher.observe('tablet-2', 'x', 'gtts')
+    prefetcher.observe('tablet-1', 'y', 'gtts')
+    # 转移按客户端记录：a -> y，而不是 tablet-2 插入的 a -> x -> y
+    assert 'y' in prefetcher.model.predict('a', 5)
+    assert prefetcher.model.predict('x') == []
+    assert prefetcher.stats()['sessions'] == 2
@@ -0,0 +1,60 @@
+import asyncio
+
+from tracing import (RequestProfiler, current_trace, export_chrome_trace, finish_trace, server_timing,
+                     span, start_trace, RECENT_TRACES)
+
+
+def test_spans_recorded_only_inside_trace():
+    with span('ignored'):
+        pass
+    trace, token = start_trace('get_audio')
+    with span('cache_check'):
+        pass
+    with span('synthesize', engine='gtts'):
+        pass
+    finish_trace(trace, token)
+
+    assert current_trace() is None
+    assert RECENT_TRACES[-1] is trace
+    assert [name for name, _, _, _ in trace.spans] == ['cache_check', 'synthesize']
+    assert trace.spans[1][3] == {'engine': 'gtts'}
+    header = server_timing(trace)
+    assert header.startswith('cache_check;dur=') and ', synthesize;dur=' in header
+    assert header.split(', ')[-1].startswith('total;dur=')
+
+
+def test_export_chrome_trace_one_row_per_request():
+    traces = []
+    for name in ('get_audio', 'suggest'):
+        trace, token = start_trace(name)
+        trace.attrs['status'] = 200
+        with span('work', step=1):
+            pass
+        traces.append(finish_trace(trace, token))
+
+    events = export_chrome_trace(traces)['traceEvents']
+    assert [(event['name'], event['tid']) for event in events] == [
+        ('get_audio', 1), ('work', 1), ('suggest', 2), ('work', 2)]
+    assert all(event['ph'] == 'X' for event in events)
+    assert events[0]['args'] == {'trace_id': traces[0].trace_id, 'status': 200}
+    assert events[1]['args'] == {'step': 1}
+    assert events[1]['ts'] >= events[0]['ts']
+
+
+def test_profiler_samples_only_armed_requests():
+    profiler = RequestProfiler()
+
+    @profiler.profiled
+    async def view(n):
+        return sum(range(n))
+
+    assert asyncio.run(view(10)) == 45
+    assert profiler.report() == {'remaining': 0, 'sampled': 0, 'functions': []}
+
+    profiler.arm(2)
+    for _ in range(3):
+        asyncio.run(view(1000))
+    report = profiler.report(limit=5)
+    assert report['remaining'] == 0 and report['sampled'] == 2
+    assert 0 < len(report['functions']) <= 5
+    assert any('view' in row['function'] for row in profiler.report(limit=1000)['functions'])
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+from tts_registry import StrategyRegistry, default_enabled_engines
+
+# 用标准库的类代替真实引擎，不依赖 gTTS / edge-tts
+FAKE_ENGINES = {'fake': ('collections:OrderedDict', {'voice': 'test'})}
+
+
+def test_engines_load_lazily_once():
+    registry = StrategyRegistry(enabled=['fake', 'gtts'], default='fake', engines=FAKE_ENGINES)
+    assert registry.stats() == {'fake': {'loaded': False}, 'gtts': {'loaded': False}}
+
+    instance = registry.get('fake')
+    assert instance == OrderedDict(voice='test')
+    assert registry.get('fake') is instance
+    stats = registry.stats()
+    assert stats['fake']['loaded'] and 'import_ms' in stats['fake'] and 'init_ms' in stats['fake']
+    assert stats['gtts'] == {'loaded': False}
+
+
+def test_disabled_engine_returns_none_without_fallback():
+    registry = StrategyRegistry(enabled=['fake'], default='fake', engines=FAKE_ENGINES)
+    assert registry.get('macsay') is None
+    assert registry.get('unknown') is None
+    assert 'macsay' not in registry
+    assert registry.stats() == {'fake': {'loaded': False}}
+
+
+def test_default_must_be_enabled():
+    registry = StrategyRegistry(enabled=['fake', 'edgetts'], default='gtts', engines=FAKE_ENGINES)
+    assert registry.default == 'fake'
+    assert registry.names() == ['fake', 'edgetts']
+    assert StrategyRegistry(enabled=[], default='gtts').default is None
+
+
+def test_enabled_engines_from_environment(monkeypatch):
+    monkeypatch.setenv('TTS_ENGINES', ' EdgeTTS, gtts ,')
+    assert default_enabled_engines() == ['edgetts', 'gtts']
+    monkeypatch.delenv('TTS_ENGINES')
+    assert 'gtts' in default_enabled_engines()
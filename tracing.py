@@ -0,0 +1,198 @@
+import time
+import uuid
+import cProfile
+import pstats
+import threading
+import contextvars
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+# 当前请求的追踪对象，没有活动追踪时 span() 不做任何事
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+# 最近完成的请求追踪，供 /admin/traces 导出
+RECENT_TRACES = deque(maxlen=200)
+
+
+class Trace:
+    """
+    单个请求的追踪记录，包含若干计时区间（span）。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.attrs = {}
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'start': self.wall_start,
+            'duration_ms': round((self.duration or 0) * 1000, 3),
+            'attrs': self.attrs,
+            'spans': [
+                {'name': name, 'offset_ms': round(offset * 1000, 3),
+                 'duration_ms': round(duration * 1000, 3), 'attrs': attrs}
+                for name, offset, duration, attrs in self.spans
+            ],
+        }
+
+
+def start_trace(name: str):
+    """
+    开始追踪一个请求，返回 (追踪对象, contextvar token)。
+    """
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+
+def finish_trace(trace: Trace, token=None):
+    """
+    结束追踪并放入最近追踪列表。
+    """
+    trace.finish()
+    if token is not None:
+        _current_trace.reset(token)
+    RECENT_TRACES.append(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    记录一个计时区间，没有活动追踪时开销只有一次 contextvar 读取。
+
+    用法:
+        with span('tts.gtts', text=hanzi):
+            ...
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans.append((name, start - trace.start, time.perf_counter() - start, attrs))
+
+
+def server_timing(trace: Trace) -> str:
+    """
+    生成 W3C Server-Timing 响应头，浏览器开发者工具可直接显示各阶段耗时。
+    """
+    parts = [f'{name.replace(" ", "_")};dur={duration * 1000:.2f}'
+             for name, _, duration, _ in trace.spans]
+    parts.append(f'total;dur={(trace.duration or 0) * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def export_chrome_trace(traces):
+    """
+    导出为 Chrome Trace Event 格式（chrome://tracing、Perfetto 可直接打开）。
+
+    每个请求占一行（tid），请求本身和其中的 span 都是 "X"（完整事件）。
+    """
+    events = []
+    for tid, trace in enumerate(traces, start=1):
+        base_us = trace.wall_start * 1e6
+        events.append({
+            'name': trace.name, 'ph': 'X', 'pid': 1, 'tid': tid,
+            'ts': round(base_us), 'dur': round((trace.duration or 0) * 1e6),
+            'args': {'trace_id': trace.trace_id, **trace.attrs},
+        })
+        for name, offset, duration, attrs in trace.spans:
+            events.append({
+                'name': name, 'ph': 'X', 'pid': 1, 'tid': tid,
+                'ts': round(base_us + offset * 1e6), 'dur': round(duration * 1e6),
+                'args': attrs,
+            })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+class RequestProfiler:
+    """
+    按需对接下来的 N 个请求做 cProfile 采样，并汇总热点函数。
+
+    平时不启用，arm(n) 之后被 profiled 包装的请求依次进入采样，
+    采满 N 个后自动停止，结果可通过 report() 查看。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._sampled = 0
+        self._stats = None
+
+    def arm(self, count: int):
+        with self._lock:
+            self._remaining = max(0, int(count))
+            self._sampled = 0
+            self._stats = None
+
+    def _claim(self):
+        if not self._remaining:
+            return False
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+    def _collect(self, profile):
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self._sampled += 1
+
+    def profiled(self, func):
+        """
+        装饰 async 视图函数，被选中采样的请求在 cProfile 下执行。
+        """
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not self._claim():
+                return await func(*args, **kwargs)
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profile.disable()
+                self._collect(profile)
+        return wrapper
+
+    def report(self, limit: int = 30):
+        """
+        返回采样状态和按累计耗时排序的热点函数。
+        """
+        with self._lock:
+            result = {'remaining': self._remaining, 'sampled': self._sampled, 'functions': []}
+            if self._stats is None:
+                return result
+            rows = []
+            for (filename, line, func), (cc, nc, tt, ct, _) in self._stats.stats.items():
+                rows.append({
+                    'function': f'{filename}:{line}({func})',
+                    'calls': nc,
+                    'total_ms': round(tt * 1000, 3),
+                    'cumulative_ms': round(ct * 1000, 3),
+                })
+        rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+        result['functions'] = rows[:limit]
+        return result
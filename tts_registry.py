@@ -0,0 +1,122 @@
+import os
+import platform
+import threading
+import time
+import logging
+import importlib
+
+logger = logging.getLogger(__name__)
+
+# 内置 TTS 引擎：名称 -> (模块:类, 构造参数)
+BUILTIN_ENGINES = {
+    'gtts': ('tts_strategies:GTTSStrategy', {}),
+    'macsay': ('tts_strategies:MacSayStrategy', {}),
+    'edgetts': ('tts_strategies:EdgeTTSStrategy', {'voice': 'zh-CN-XiaoxiaoNeural'}),
+}
+
+# 第三方引擎通过该入口点组注册，值为 "模块:类"
+ENTRY_POINT_GROUP = 'pinyin_trans.tts'
+
+
+def _discover_entry_points():
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return {}
+    try:
+        eps = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python 3.8/3.9 返回按组划分的字典
+        eps = entry_points().get(ENTRY_POINT_GROUP, [])
+    return {ep.name: (ep.value, {}) for ep in eps}
+
+
+def default_enabled_engines():
+    """
+    读取部署启用的引擎列表。
+
+    优先使用环境变量 TTS_ENGINES（逗号分隔），未设置时启用全部内置引擎，
+    macsay 仅在 macOS 上启用。
+    """
+    configured = os.environ.get('TTS_ENGINES')
+    if configured:
+        return [name.strip().lower() for name in configured.split(',') if name.strip()]
+    return [name for name in BUILTIN_ENGINES
+            if name != 'macsay' or platform.system() == 'Darwin']
+
+
+class StrategyRegistry:
+    """
+    TTS 策略注册表，按需导入和初始化引擎。
+
+    注册时只记录 "模块:类" 字符串，第一次 get() 时才导入模块并创建实例，
+    因此启动耗时只取决于实际用到的引擎。每个引擎的导入和初始化耗时可通过 stats() 查看。
+    """
+
+    def __init__(self, enabled=None, default='gtts', engines=None):
+        specs = dict(BUILTIN_ENGINES)
+        specs.update(_discover_entry_points())
+        if engines:
+            specs.update(engines)
+        enabled = enabled if enabled is not None else default_enabled_engines()
+        self._specs = {name: specs[name] for name in enabled if name in specs}
+        self.default = default if default in self._specs else next(iter(self._specs), None)
+        self._instances = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        return list(self._specs)
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def _load(self, name):
+        target, kwargs = self._specs[name]
+        module_name, _, class_name = target.partition(':')
+
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        strategy_class = getattr(module, class_name)
+        imported = time.perf_counter()
+        instance = strategy_class(**kwargs)
+        initialized = time.perf_counter()
+
+        self._stats[name] = {
+            'import_ms': round((imported - start) * 1000, 2),
+            'init_ms': round((initialized - imported) * 1000, 2),
+        }
+        logger.info(f"[StrategyRegistry] 已加载 {name}: 导入 {self._stats[name]['import_ms']}ms, "
+                    f"初始化 {self._stats[name]['init_ms']}ms", extra={'model': name})
+        return instance
+
+    def get(self, name):
+        """
+        返回引擎实例，首次调用时导入并初始化。
+
+        参数:
+            name (str): 引擎名称。
+
+        返回:
+            TTSStrategy: 策略实例；引擎未启用时返回 None。
+            不回退到默认引擎，否则缓存文件名和失败记录会与实际使用的引擎不一致。
+        """
+        if name not in self._specs:
+            return None
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            # 双重检查，避免并发请求重复初始化
+            if name not in self._instances:
+                self._instances[name] = self._load(name)
+            return self._instances[name]
+
+    def stats(self):
+        """
+        返回每个启用引擎的加载状态和耗时。
+        """
+        return {
+            name: {'loaded': name in self._instances, **self._stats.get(name, {})}
+            for name in self._specs
+        }
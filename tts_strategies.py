@@ -1,8 +1,11 @@
 import os
 import subprocess
 import asyncio
-from gtts import gTTS
-import edge_tts  # 新增导入 Microsoft Edge TTS 库
+import logging
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
 
 class TTSStrategy:
     """
@@ -23,9 +26,15 @@ class GTTSStrategy(TTSStrategy):
     """
     使用 gTTS 的具体策略实现。
     """
+    def __init__(self):
+        # 延迟到实例化时导入，未启用 gtts 的部署不必加载该库
+        from gtts import gTTS
+        self._gtts = gTTS
+
     def text_to_speech(self, text: str, lang: str, output_path: str):
-        tts = gTTS(text=text, lang=lang)
-        tts.save(output_path)  # 保存音频文件到指定路径
+        with span('gtts.save'):
+            tts = self._gtts(text=text, lang=lang)
+            tts.save(output_path)  # 保存音频文件到指定路径
         return output_path
 
     @property
@@ -49,19 +58,21 @@ class MacSayStrategy(TTSStrategy):
         # 先生成 .aiff 音频
         cmd_aiff = ['say', '-v', voice_name, '-o', temp_aiff, text]
         try:
-            subprocess.run(cmd_aiff, check=True, capture_output=True, text=True)
+            with span('macsay.say'):
+                subprocess.run(cmd_aiff, check=True, capture_output=True, text=True)
         except subprocess.CalledProcessError as e:
-            print(f"生成 AIFF 失败: {e.stderr}")
+            logger.error(f"生成 AIFF 失败: {e.stderr}", extra={'model': 'macsay'})
             raise
 
         # 使用 afconvert 将 .aiff 转换为 .wav
         cmd_wav = ['afconvert', '-f', 'WAVE', '-d', 'LEI16', temp_aiff, output_path]
         try:
-            subprocess.run(cmd_wav, check=True, capture_output=True, text=True)
+            with span('macsay.afconvert'):
+                subprocess.run(cmd_wav, check=True, capture_output=True, text=True)
             os.remove(temp_aiff)  # 删除临时文件
             return output_path
         except subprocess.CalledProcessError as e:
-            print(f"转换音频格式失败: {e.stderr}")
+            logger.error(f"转换音频格式失败: {e.stderr}", extra={'model': 'macsay'})
             raise RuntimeError(f"语音合成失败，请检查系统语音设置") from e
 
     @property
@@ -74,27 +85,31 @@ class EdgeTTSStrategy(TTSStrategy):
     """
 
     def __init__(self, voice='zh-CN-XiaoxiaoNeural'):
+        # 延迟到实例化时导入 Microsoft Edge TTS 库
+        from edge_tts import Communicate
+        self._communicate = Communicate
         self.voice = voice
 
     async def text_to_speech(self, text: str, lang: str, output_path: str):
         try:
-            from edge_tts import Communicate
-            print(f"[EdgeTTSStrategy] 正在尝试合成语音: 文本='{text}', 语言='{lang}', 输出路径='{output_path}'")  # 添加详细调试信息
+            logger.debug("[EdgeTTSStrategy] 正在尝试合成语音: 文本='%s', 语言='%s', 输出路径='%s'",
+                         text, lang, output_path, extra={'model': 'edgetts'})
             
             if not text or text.strip() == "":
                 raise ValueError("文本内容为空，无法合成语音")
 
-            communicate = Communicate(text=text, voice=self.voice)
-            await communicate.save(output_path)
-            print(f"[EdgeTTSStrategy] 音频文件已成功保存到: {output_path}")  # 添加成功保存提示
+            with span('edgetts.save'):
+                communicate = self._communicate(text=text, voice=self.voice)
+                await communicate.save(output_path)
+            logger.debug("[EdgeTTSStrategy] 音频文件已成功保存到: %s", output_path, extra={'model': 'edgetts'})
             return output_path
         except Exception as e:
-            print(f"[EdgeTTSStrategy] 合成失败: {str(e)}")  # 更清晰的错误输出
+            logger.error(f"[EdgeTTSStrategy] 合成失败: {str(e)}", extra={'model': 'edgetts'})
             raise
 
     @property
     def name(self):
         return 'edgetts'  # 提供模型名称用于日志
 
-# 默认策略设置为 gTTS
-DEFAULT_TTS_STRATEGY = GTTSStrategy()
\ No newline at end of file
+# 默认策略名称（实例由 tts_registry.StrategyRegistry 按需创建）
+DEFAULT_TTS_STRATEGY = 'gtts'
\ No newline at end of file